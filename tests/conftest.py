@@ -0,0 +1,9 @@
+"""Make the modules of `tmc/` importable the same way `get_data.py` imports them"""
+
+import os
+import sys
+
+# Author ids need a key
+os.environ.setdefault("TMC_AUTHOR_KEY", "test key")
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tmc"))
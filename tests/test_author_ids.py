@@ -0,0 +1,99 @@
+"""Tests of the author ids, the author bridge, and the derived tables"""
+
+import os
+import stat
+import pandas as pd
+import pytest
+
+from tmc_utils import author_ids as ai
+from tmc_utils.author_graph import author_section_counts, update_author_section_counts
+
+
+@pytest.fixture
+def author_key(monkeypatch):
+    """Set the key of the author ids for a test"""
+
+    def set_key(key):
+        if key is None:
+            monkeypatch.delenv(ai.AUTHOR_KEY_ENV, raising=False)
+        else:
+            monkeypatch.setenv(ai.AUTHOR_KEY_ENV, key)
+        ai._author_key.cache_clear()
+
+    yield set_key
+    ai._author_key.cache_clear()
+
+
+def test_ids_are_stable_for_the_same_key(author_key):
+    author_key("first key")
+    first = ai.author_id("Jan Novák")
+    assert 0 <= first < 2**32
+    # Another process with the same key, e.g. the next run of the scraper
+    ai._author_key.cache_clear()
+    assert ai.author_id("Jan Novák") == first
+    assert ai.author_id("Jana Nováková") != first
+
+    author_key("second key")
+    assert ai.author_id("Jan Novák") != first
+
+
+def test_names_are_normalized(author_key):
+    author_key("key")
+    expected = ai.author_id("Jan Novák")
+    # Decomposed "á", case, and whitespace
+    assert ai.author_id("  JAN   Nova\u0301k ") == expected
+
+
+def test_missing_key_fails(author_key):
+    author_key(None)
+    with pytest.raises(RuntimeError):
+        ai.author_id("Jan Novák")
+
+
+def test_ensure_author_key_persists_a_random_key(author_key, tmp_path):
+    author_key(None)
+    path = str(tmp_path / "author_key")
+    ai.ensure_author_key(path)
+    first = ai.author_id("Jan Novák")
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+
+    # The next run reads the same key
+    author_key(None)
+    ai.ensure_author_key(path)
+    assert ai.author_id("Jan Novák") == first
+
+    # A key set in the environment takes precedence
+    author_key("own key")
+    ai.ensure_author_key(path)
+    assert ai.author_id("Jan Novák") != first
+
+
+def _articles(links, authors, date="2022-03-01"):
+    return pd.DataFrame(
+        {"link": links, "authors_hash": authors, "date": pd.to_datetime(date)}
+    )
+
+
+def test_updating_the_bridge_replaces_articles():
+    first = _articles(["/zpravy/domaci/a", "/sport/b"], [[1, 2], [2]])
+    bridge = ai.update_author_bridge(None, first)
+    edges = author_section_counts(bridge)
+
+    # The same articles again, one of them re-scraped with another author
+    again = _articles(["/zpravy/domaci/a", "/sport/b"], [[1, 2], [3]])
+    edges = update_author_section_counts(edges, bridge, again)
+    bridge = ai.update_author_bridge(bridge, again)
+
+    assert sorted(map(tuple, bridge[["link", "author_id"]].values.tolist())) == [
+        ("/sport/b", 3),
+        ("/zpravy/domaci/a", 1),
+        ("/zpravy/domaci/a", 2),
+    ]
+    pd.testing.assert_frame_equal(
+        edges.sort_values(["author_id", "section"]).reset_index(drop=True),
+        author_section_counts(bridge).sort_values(["author_id", "section"]).reset_index(drop=True),
+        check_dtype=False,
+    )
+
+    authors = ai.author_dimension_from_bridge(bridge).set_index("author_id")
+    assert authors.articles.to_dict() == {1: 1, 2: 1, 3: 1}
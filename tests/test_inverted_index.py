@@ -0,0 +1,105 @@
+"""Tests of the inverted index, its encoding, and its use when loading .csv files"""
+
+import os
+import numpy as np
+import pytest
+
+from benchmarks.fixtures import full_df_corpus, write_full_df_csvs
+from dynamic_join import csv_query, csv_to_df, csv_to_df_indexed
+from tmc_utils.inverted_index import InvertedIndex, _decode, _encode
+
+
+@pytest.mark.parametrize(
+    "values",
+    [
+        [],
+        [0],
+        [127, 128, 16383, 16384],
+        [2**35 - 1, 2**35, 2**42 - 1],
+        np.random.default_rng(0).integers(0, 2**40, 1000),
+    ],
+)
+def test_varbyte_round_trip(values):
+    values = np.asarray(values, dtype=np.int64)
+    encoded, n_bytes = _encode(values)
+    assert encoded.dtype == np.uint8
+    assert n_bytes.sum() == len(encoded)
+    np.testing.assert_array_equal(_decode(encoded), values)
+
+
+def test_small_gaps_take_one_byte():
+    encoded, _ = _encode(np.arange(128))
+    assert len(encoded) == 128
+
+
+def _scan(df, column, term):
+    return np.array(
+        [i for i, value in enumerate(df[column]) if isinstance(value, list) and term in value]
+    )
+
+
+def test_postings_match_a_scan(tmp_path):
+    df = csv_to_df(_write(tmp_path, 300))
+    index = InvertedIndex.build(df)
+    for topic in index.terms("topic"):
+        np.testing.assert_array_equal(index.postings("topic", topic), _scan(df, "topics", topic))
+    author = df.authors_hash[0][0]
+    np.testing.assert_array_equal(
+        index.postings("author", author), _scan(df, "authors_hash", author)
+    )
+    assert len(index.postings("word", "no such word")) == 0
+
+
+def test_empty_field():
+    df = full_df_corpus(20)
+    df["authors_hash"] = [[] for _ in range(len(df))]
+    index = InvertedIndex.build(df)
+    assert len(index.terms("author")) == 0
+    assert len(index.query(any_of=[("author", 1)])) == 0
+    assert len(index.query()) == 20
+
+
+def _write(tmp_path, n_rows, rows_per_file=50):
+    write_full_df_csvs(full_df_corpus(n_rows, seed=1), tmp_path, rows_per_file)
+    return f"{tmp_path}/"
+
+
+def test_save_load(tmp_path):
+    csv_path = _write(tmp_path, 200)
+    df, index = csv_to_df_indexed(csv_path)
+    loaded = InvertedIndex.load(csv_path + "inverted_index.npz")
+
+    assert loaded.checksum == index.checksum
+    assert loaded.files.tolist() == [f"full_df_{i}.csv" for i in range(4)]
+    np.testing.assert_array_equal(loaded.dates, index.dates)
+    for field in ["word", "topic", "author"]:
+        np.testing.assert_array_equal(loaded.terms(field), index.terms(field))
+    query = {"all_of": [("topic", index.terms("topic")[0])], "start": "2021-01-01"}
+    np.testing.assert_array_equal(loaded.query(**query), index.query(**query))
+
+
+def test_index_is_rebuilt_when_a_file_changes(tmp_path, capsys):
+    csv_path = _write(tmp_path, 200)
+    csv_to_df_indexed(csv_path)
+    csv_to_df_indexed(csv_path)
+    assert "out of date" not in capsys.readouterr().out
+
+    stat = os.stat(csv_path + "full_df_1.csv")
+    os.utime(csv_path + "full_df_1.csv", ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    df, index = csv_to_df_indexed(csv_path)
+    assert "out of date" in capsys.readouterr().out
+    assert len(index) == len(df)
+
+
+def test_csv_query_loads_only_matching_articles(tmp_path):
+    csv_path = _write(tmp_path, 200)
+    df, index = csv_to_df_indexed(csv_path)
+    topic = index.terms("topic")[0]
+    query = {"all_of": [("topic", topic)], "end": "2021-06-30"}
+    ids = index.query(**query)
+    assert 0 < len(ids) < len(df)
+
+    matches = csv_query(csv_path, **query)
+    assert matches.link.tolist() == df.link.iloc[ids].tolist()
+    assert all(topic in topics for topics in matches.topics)
+    assert len(csv_query(csv_path, all_of=[("word", "no such word")])) == 0
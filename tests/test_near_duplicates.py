@@ -0,0 +1,75 @@
+"""Tests of near-duplicate detection and of its independence of the input order"""
+
+import random
+import pandas as pd
+
+from benchmarks.fixtures import full_df_corpus, make_vocabulary, write_full_df_csvs
+from dynamic_join import csv_to_df
+from tmc_utils.near_duplicates import MinHashLSH, drop_near_duplicates, mark_near_duplicates
+
+
+def _articles(n_originals=40, n_words=200, changed=8, seed=0):
+    """Original articles and copies of them with `changed` words replaced"""
+    rng = random.Random(seed)
+    vocabulary = make_vocabulary(size=20000, seed=seed)
+    originals = {f"/zpravy/a{i}": set(rng.sample(vocabulary, n_words)) for i in range(n_originals)}
+    copies = {}
+    for link, tokens in originals.items():
+        kept = rng.sample(sorted(tokens), n_words - changed)
+        copies[link + "-copy"] = set(kept) | set(rng.sample(vocabulary, changed))
+    return originals, copies
+
+
+def test_lsh_recall_on_near_duplicates():
+    originals, copies = _articles()
+    lsh = MinHashLSH()
+    for link, tokens in {**originals, **copies}.items():
+        lsh.insert(link, tokens)
+
+    # Jaccard similarity of the pairs is about 0.92, well above the threshold of 0.8
+    found = sum(lsh.cluster(link + "-copy") == link for link in originals)
+    assert found == len(originals)
+    # Unrelated articles share a few words at most
+    assert all(lsh.cluster_size(link) == 2 for link in originals)
+
+
+def test_insert_returns_cluster():
+    lsh = MinHashLSH()
+    tokens = {f"w{i}" for i in range(100)}
+    assert lsh.insert("a", tokens) == "a"
+    assert lsh.insert("b", tokens) == "a"
+    assert lsh.insert("b", set()) == "a"
+    assert lsh.similarity("a", "b") == 1.0
+
+
+def _frame(articles):
+    dates = pd.date_range("2021-01-01", periods=len(articles), freq="h")
+    return pd.DataFrame(
+        {
+            "link": list(articles),
+            "date": dates,
+            "title": [sorted(tokens) for tokens in articles.values()],
+        }
+    )
+
+
+def test_drop_near_duplicates_is_independent_of_row_order():
+    originals, copies = _articles(n_originals=15)
+    df = _frame({**originals, **copies})
+
+    kept = drop_near_duplicates(mark_near_duplicates(df.copy()))
+    # The originals are older than their copies
+    assert sorted(kept.link) == sorted(originals)
+
+    for seed in range(3):
+        shuffled = df.sample(frac=1, random_state=seed).reset_index(drop=True)
+        marked = mark_near_duplicates(shuffled)
+        assert sorted(drop_near_duplicates(marked).link) == sorted(originals)
+
+
+def test_csv_to_df_joins_files_by_list_number(tmp_path):
+    df = full_df_corpus(60, seed=3)
+    # Files 0 to 11, "full_df_10.csv" sorts before "full_df_2.csv" by name
+    write_full_df_csvs(df, tmp_path, rows_per_file=5)
+    loaded = csv_to_df(f"{tmp_path}/")
+    assert loaded.link.tolist() == df.link.tolist()
@@ -0,0 +1,100 @@
+"""Tests of the streaming pipeline with stand-in fetchers, without network access"""
+
+import time
+import nltk
+import pandas as pd
+import pytest
+from bs4 import BeautifulSoup
+
+from benchmarks.fixtures import article_page_html, list_page_html
+from dynamic_join import csv_to_df
+from tmc_utils import article_scraper as arts
+from tmc_utils import clean_text, pipeline
+
+
+class _Fatal(BaseException):
+    """Error that isn't handled as a failing article"""
+
+
+@pytest.fixture(autouse=True)
+def tokenizer(monkeypatch):
+    """Split on whitespace if the NLTK tokenizer isn't installed (it can't be downloaded here)"""
+    try:
+        nltk.data.find("tokenizers/punkt")
+    except LookupError:
+        monkeypatch.setattr(clean_text, "_ensure_punkt", lambda: None)
+        monkeypatch.setattr(nltk.tokenize, "word_tokenize", lambda text, *args, **kw: text.split())
+
+
+@pytest.fixture
+def fetchers(monkeypatch):
+    """Stand-in list and article fetchers, list 3 is empty and list 4 can't be obtained"""
+    delays = {}
+
+    def soup_object_tor(url, *args, **kwargs):
+        i = int(url.rsplit("/", 1)[1])
+        if i == 4:
+            return None
+        return BeautifulSoup(list_page_html(0 if i == 3 else 12, seed=i), "html.parser")
+
+    def soup_object_request_all(url, *args, **kwargs):
+        seed = sum(map(ord, url)) % 97
+        # Earlier articles take longer, so they finish out of order
+        time.sleep(delays.get("article", 0) * (seed % 4))
+        return BeautifulSoup(article_page_html(4, seed=seed), "html.parser")
+
+    monkeypatch.setattr(arts, "soup_object_tor", soup_object_tor)
+    monkeypatch.setattr(arts, "soup_object_request_all", soup_object_request_all)
+    return delays
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    (tmp_path / "partial_dfs").mkdir()
+    (tmp_path / "full_dfs").mkdir()
+    return tmp_path
+
+
+def _run(data_dir, **kwargs):
+    options = {"fetch_workers": 3, "sleeping": (0, 0), "list_sleeping": (0, 0)}
+    return pipeline.run_pipeline(
+        range(1, 6), "https://www.idnes.cz/zpravy/archiv/{}", data_dir=str(data_dir),
+        prefetch_snapshots=False, **{**options, **kwargs}
+    )
+
+
+def test_lists_are_written_in_list_order(data_dir, fetchers):
+    fetchers["article"] = 0.01
+    done = []
+    written = _run(data_dir, on_list_done=lambda i, df: done.append((i, len(df))))
+
+    assert sorted(done) == [(1, 12), (2, 12), (3, 0), (5, 12)]
+    assert written == 36
+    for i in (1, 2, 5):
+        partial = pd.read_csv(data_dir / "partial_dfs" / f"partial_df_{i}.csv", index_col=0)
+        full = pd.read_csv(data_dir / "full_dfs" / f"full_df_{i}.csv", index_col=0)
+        assert full.index.tolist() == list(range(12))
+        assert full.link.tolist() == partial.link.tolist()
+
+    df = csv_to_df(f"{data_dir}/full_dfs/")
+    assert df.list_number.tolist() == [1] * 12 + [2] * 12 + [5] * 12
+    assert df.list_position.tolist() == list(range(12)) * 3
+
+
+def test_failing_stage_stops_sleeping_workers(data_dir, fetchers, monkeypatch):
+    soup_object_tor = arts.soup_object_tor
+
+    def failing_soup_object_tor(url, *args, **kwargs):
+        if url.endswith("/2"):
+            # The fetch workers are sleeping after the articles of list 1 by now
+            time.sleep(0.5)
+            raise _Fatal
+        return soup_object_tor(url, *args, **kwargs)
+
+    monkeypatch.setattr(arts, "soup_object_tor", failing_soup_object_tor)
+    start = time.perf_counter()
+    with pytest.raises(RuntimeError) as error:
+        # The fetch workers would sleep 30 seconds after every article
+        _run(data_dir, sleeping=(30, 30))
+    assert isinstance(error.value.__cause__, _Fatal)
+    assert time.perf_counter() - start < 5
@@ -0,0 +1,165 @@
+"""Tests of `TorCircuitPool` against stand-in SOCKS5 proxies
+
+Each stand-in proxy accepts SOCKS5 connections with username / password
+authentication and answers the HTTP request itself, so no TOR process or
+network access is needed. The proxies record the port and the SOCKS
+username of every request, the username identifying the circuit.
+"""
+
+import socket
+import socketserver
+import struct
+import threading
+import time
+import pytest
+
+pytest.importorskip("socks")
+pytest.importorskip("stem")
+
+from tmc_utils.tor_initialization import TorCircuitPool  # noqa: E402
+
+
+class _SocksHandler(socketserver.BaseRequestHandler):
+    def _read(self, n):
+        data = b""
+        while len(data) < n:
+            chunk = self.request.recv(n - len(data))
+            if not chunk:
+                raise ConnectionError("Connection closed by the client")
+            data += chunk
+        return data
+
+    def handle(self):
+        proxy = self.server.proxy
+        if proxy.refuse:
+            return
+
+        # Greeting, username / password authentication (RFC 1929)
+        _, n_methods = self._read(2)
+        self._read(n_methods)
+        self.request.sendall(b"\x05\x02")
+        _, username_length = self._read(2)
+        username = self._read(username_length).decode()
+        self._read(self._read(1)[0])
+        self.request.sendall(b"\x01\x00")
+
+        # CONNECT request, the target isn't connected to
+        _, _, _, address_type = self._read(4)
+        if address_type == 1:
+            self._read(4)
+        elif address_type == 3:
+            self._read(self._read(1)[0])
+        else:
+            self._read(16)
+        self._read(2)
+        bound = socket.inet_aton("127.0.0.1") + struct.pack(">H", 0)
+        self.request.sendall(b"\x05\x00\x00\x01" + bound)
+
+        request = b""
+        while b"\r\n\r\n" not in request:
+            request += self.request.recv(4096)
+        status = proxy.respond(username)
+        reason = {200: "OK", 429: "Too Many Requests"}[status]
+        body = f"{proxy.port} {username}".encode()
+        self.request.sendall(
+            f"HTTP/1.1 {status} {reason}\r\nContent-Length: {len(body)}\r\n"
+            f"Connection: close\r\nRetry-After: 0\r\n\r\n".encode()
+            + body
+        )
+
+
+class _StandInProxy:
+    """SOCKS5 proxy answering every request with a status chosen by `rate_limited`"""
+
+    def __init__(self):
+        self.server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _SocksHandler)
+        self.server.daemon_threads = True
+        self.server.proxy = self
+        self.port = self.server.server_address[1]
+        self.requests = []
+        self.rate_limited = set()
+        self.refuse = False
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def respond(self, username):
+        self.requests.append(username)
+        return 429 if username in self.rate_limited else 200
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def proxies():
+    stand_ins = [_StandInProxy() for _ in range(3)]
+    yield stand_ins
+    for proxy in stand_ins:
+        proxy.close()
+
+
+def _username(pool, index):
+    return pool.sessions[index].proxies["http"].split("//")[1].split(":")[0]
+
+
+def test_requests_are_spread_round_robin(proxies):
+    pool = TorCircuitPool([proxy.port for proxy in proxies])
+    for _ in range(6):
+        assert pool.get("http://127.0.0.1:1/", timeout=5).status_code == 200
+    assert [len(proxy.requests) for proxy in proxies] == [2, 2, 2]
+
+
+def test_rate_limited_circuit_is_rotated_and_request_moves_on(proxies):
+    pool = TorCircuitPool([proxy.port for proxy in proxies])
+    old_username = _username(pool, 0)
+    proxies[0].rate_limited.add(old_username)
+
+    response = pool.get("http://127.0.0.1:1/", timeout=5)
+
+    assert response.status_code == 200
+    assert response.text.startswith(str(proxies[1].port))
+    # The session didn't retry the 429 on the same circuit, the pool rotated it instead
+    assert proxies[0].requests == [old_username]
+    assert _username(pool, 0) != old_username
+
+
+def test_all_circuits_rate_limited_returns_last_response(proxies):
+    pool = TorCircuitPool([proxy.port for proxy in proxies])
+    for index, proxy in enumerate(proxies):
+        proxy.rate_limited.add(_username(pool, index))
+
+    response = pool.get("http://127.0.0.1:1/", timeout=5)
+
+    assert response.status_code == 429
+    assert [len(proxy.requests) for proxy in proxies] == [1, 1, 1]
+
+
+def test_failed_circuit_recovers_after_cooldown(proxies):
+    pool = TorCircuitPool([proxy.port for proxy in proxies], cooldown=0.5)
+    proxies[2].refuse = True
+
+    results = pool.check_health("http://127.0.0.1:1/", timeout=5)
+    assert results[proxies[2].port] is None
+    assert pool.healthy == [True, True, False]
+
+    for _ in range(4):
+        pool.get("http://127.0.0.1:1/", timeout=5)
+    assert len(proxies[2].requests) == 0
+
+    proxies[2].refuse = False
+    time.sleep(0.6)
+    assert pool.healthy == [True, True, True]
+    for _ in range(3):
+        pool.get("http://127.0.0.1:1/", timeout=5)
+    assert len(proxies[2].requests) == 1
+
+
+def test_rotation_drops_connection_pools_of_old_credentials(proxies):
+    pool = TorCircuitPool([proxy.port for proxy in proxies])
+    session = pool.sessions[0]
+    for _ in range(5):
+        pool.get("http://127.0.0.1:1/", timeout=5)
+        pool.rotate(session)
+    managers = [url for adapter in session.adapters.values() for url in adapter.proxy_manager]
+    assert managers == []
+    assert pool.get("http://127.0.0.1:1/", timeout=5).status_code == 200
@@ -0,0 +1,81 @@
+"""Tests of the `SpaceSaving` sketch and of filling it from .csv files"""
+
+import random
+from collections import Counter
+import pandas as pd
+
+from tmc_utils.word_sketch import SpaceSaving
+from dynamic_join import word_sketch_from_csv
+
+
+def _stream(seed, n=5000, vocabulary=300):
+    rng = random.Random(seed)
+    # Zipf-like distribution, a few frequent words and a long tail
+    weights = [1 / (rank + 1) for rank in range(vocabulary)]
+    return rng.choices([f"w{rank}" for rank in range(vocabulary)], weights, k=n)
+
+
+def _sketch(words, capacity):
+    sketch = SpaceSaving(capacity)
+    for word in words:
+        sketch.update(word)
+    return sketch
+
+
+def _assert_within_bound(sketch, truth):
+    for word, count in sketch.counts.items():
+        assert truth[word] <= count <= truth[word] + sketch.error_bound
+        assert sketch.guaranteed(word) <= truth[word]
+    # Every word above the error bound is tracked
+    for word, count in truth.items():
+        if count > sketch.error_bound:
+            assert word in sketch.counts
+
+
+def test_error_bound():
+    words = _stream(0)
+    sketch = _sketch(words, 50)
+    assert sketch.error_bound == len(words) / 50
+    _assert_within_bound(sketch, Counter(words))
+
+
+def test_merge_error_bound_equal_capacities():
+    first, second = _stream(1), _stream(2)
+    merged = _sketch(first, 50).merge(_sketch(second, 50))
+    assert merged.total == len(first) + len(second)
+    assert merged.error_bound == merged.total / 50
+    _assert_within_bound(merged, Counter(first) + Counter(second))
+
+
+def test_merge_error_bound_unequal_capacities():
+    first, second = _stream(3), _stream(4)
+    small, large = _sketch(first, 20), _sketch(second, 100)
+    merged = large + small
+    assert merged.capacity == 100
+    # The smaller sketch dominates the bound, total / capacity would understate it
+    assert merged.error_bound == len(first) / 20 + len(second) / 100
+    _assert_within_bound(merged, Counter(first) + Counter(second))
+
+    # Words added after the merge only add total / capacity
+    merged.update("w0", 10)
+    assert merged.error_bound == len(first) / 20 + len(second) / 100 + 10 / 100
+
+
+def test_word_sketch_from_csv(tmp_path):
+    truth = Counter()
+    for i in range(3):
+        counters = [Counter(_stream(10 * i + j, n=200)) for j in range(7)]
+        for counter in counters:
+            truth.update(counter)
+        pd.DataFrame(
+            {"link": range(7), "word_counter": [list(c.most_common()) for c in counters]}
+        ).to_csv(tmp_path / f"full_df_{i}.csv")
+    (tmp_path / "notes.txt").write_text("not a .csv file")
+
+    sketch = word_sketch_from_csv(f"{tmp_path}/", capacity=1000, chunksize=3)
+    # The capacity covers the whole vocabulary, so the counts are exact
+    assert sketch.total == sum(truth.values())
+    assert Counter(sketch.counts) == truth
+
+    sketch = word_sketch_from_csv(f"{tmp_path}/", capacity=30, chunksize=3)
+    _assert_within_bound(sketch, truth)
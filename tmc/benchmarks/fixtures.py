@@ -0,0 +1,236 @@
+"""Synthetic idnes.cz fixtures for offline benchmarks.
+
+Generates article list pages and article pages that follow the HTML structure
+expected by `article_scraper.py` (`list-art-count`, `art-text`, `art-tags`,
+authors, and the `opener` / `excert` / `content` fallbacks), as well as
+synthetic `full_df` corpora in the same .csv format as written by
+`get_data.py`. All generators are seeded, so the same arguments always produce
+the same fixtures.
+
+The module contains the following functions:
+
+- `make_vocabulary(size=5000, seed=0)` - Generates Czech-looking words
+- `list_page_html(n_articles=36, seed=0)` - Generates an article list page
+- `article_page_html(n_paragraphs=12, seed=0)` - Generates an article page
+- `full_df_corpus(n_rows, seed=0)` - Generates a synthetic `full_df` dataframe
+- `write_full_df_csvs(df, directory, rows_per_file=10000)` - Saves a corpus as `full_df` .csv files
+"""
+
+from os.path import join
+import numpy as np
+import pandas as pd
+
+SYLLABLES = [
+    "ko", "ro", "na", "vi", "rus", "vlá", "da", "mi", "nis", "tr", "oč", "ko", "vá",
+    "ní", "ne", "moc", "ni", "ce", "pa", "ci", "ent", "zá", "kaz", "ro", "uš", "ka",
+    "test", "ov", "á", "ní", "kr", "aj", "zdr", "av", "ot", "ní", "ci", "pří", "pad",
+]
+SECTIONS = ["zpravy", "ekonomika", "sport", "kultura", "zlin", "praha", "brno"]
+SUBSECTIONS = ["domaci", "zahranicni", "koronavirus", "zdravi", "veda"]
+TAGS = [
+    "Koronavirus", "Covid-19", "Očkování", "Vláda ČR", "Ministerstvo zdravotnictví",
+    "Evropská unie", "Pandemie", "Respirátory", "Testování", "Nemocnice",
+]
+
+
+def make_vocabulary(size=5000, seed=0):
+    """Generate a list of unique Czech-looking words in random order
+
+    Args:
+        size (int, optional): Number of words, defaults to 5000
+        seed (int, optional): Random seed, defaults to 0
+
+    Returns:
+        (list): List of words
+    """
+    rng = np.random.default_rng(seed)
+    words = set()
+    while len(words) < size:
+        n_syllables = rng.integers(2, 5)
+        words.add("".join(rng.choice(SYLLABLES, n_syllables)))
+    # Shuffle so that the most frequent (lowest rank) words aren't alphabetical
+    return rng.permutation(sorted(words)).tolist()
+
+
+def _sentence(rng, vocabulary, n_words):
+    # Zipf-distributed word choice mimics natural word frequencies
+    ranks = np.minimum(rng.zipf(1.3, n_words), len(vocabulary)) - 1
+    words = [vocabulary[r] for r in ranks]
+    # Sprinkle in numbers and punctuation for the cleaner to remove
+    words[0] = words[0].capitalize()
+    if n_words > 4:
+        words[n_words // 2] = f"{rng.integers(1, 10000)},"
+    return " ".join(words) + "."
+
+
+def _link(rng, i):
+    section = rng.choice(SECTIONS)
+    subsection = rng.choice(SUBSECTIONS)
+    return (
+        f"https://www.idnes.cz/{section}/{subsection}/clanek-{i}"
+        f".A22{rng.integers(1, 13):02d}{rng.integers(1, 29):02d}_{rng.integers(100000, 999999)}"
+        f"_{subsection}_abc"
+    )
+
+
+def list_page_html(n_articles=36, seed=0):
+    """Generate an article list page in the idnes.cz HTML structure
+
+    Args:
+        n_articles (int, optional): Number of articles on the page, defaults to 36
+        seed (int, optional): Random seed, defaults to 0
+
+    Returns:
+        (str): HTML document
+    """
+    rng = np.random.default_rng(seed)
+    vocabulary = make_vocabulary(seed=seed)
+    items = []
+
+    for i in range(n_articles):
+        link = _link(rng, i)
+        kind = rng.choice(
+            ["plain", "premium", "video", "gallery", "no_perex"],
+            p=[0.8, 0.05, 0.05, 0.05, 0.05],
+        )
+        if kind == "gallery":
+            link += "/foto"
+        # Some articles have no specific time of publication
+        if rng.random() < 0.05:
+            hour, minute = 0, 0
+        else:
+            hour, minute = rng.integers(6, 23), rng.integers(0, 60)
+        date = f"2022-{rng.integers(1, 13):02d}-{rng.integers(1, 29):02d}"
+
+        if kind == "no_perex":
+            perex = ""
+        elif kind == "premium":
+            perex = (
+                '<p class="perex"><a class="premlab">Premium</a> '
+                f"{_sentence(rng, vocabulary, 25)}</p>"
+            )
+        else:
+            perex = f'<p class="perex">{_sentence(rng, vocabulary, 25)}</p>'
+        video = '<a score-type="Video" href="#">Video</a>' if kind == "video" else ""
+
+        items.append(
+            f"""<div class="art">
+  <a class="art-link" href="{link}"><h3>{_sentence(rng, vocabulary, 10)}</h3></a>
+  <span class="time" datetime="{date}T{hour:02d}:{minute:02d}:00">{hour}:{minute:02d}</span>
+  {perex}
+  {video}
+</div>"""
+        )
+
+    return (
+        '<html><body><div id="header"></div><div id="list-art-count">'
+        + "\n".join(items)
+        + "</div></body></html>"
+    )
+
+
+def article_page_html(n_paragraphs=12, seed=0):
+    """Generate an article page in the idnes.cz HTML structure
+
+    Args:
+        n_paragraphs (int, optional): Number of content paragraphs, defaults to 12
+        seed (int, optional): Random seed, defaults to 0
+
+    Returns:
+        (str): HTML document
+    """
+    rng = np.random.default_rng(seed)
+    vocabulary = make_vocabulary(seed=seed)
+
+    # Exercise the fallbacks for differently structured subpages
+    opener_class = "opener" if rng.random() < 0.8 else "excert"
+    content_attr = 'id="art-text"' if rng.random() < 0.8 else 'class="content"'
+
+    paragraphs = [f"<p>{_sentence(rng, vocabulary, 40)}</p>" for _ in range(n_paragraphs)]
+    # Paragraphs with a class (e.g. photo captions) are ignored by the scraper
+    caption = _sentence(rng, vocabulary, 8)
+    paragraphs.insert(n_paragraphs // 2, f'<p class="photo-caption">{caption}</p>')
+    authors = ", ".join(
+        f"Autor {rng.integers(0, 200)}" for _ in range(rng.integers(1, 3))
+    )
+    tags = "".join(
+        f'<a href="#">{tag}</a>' for tag in rng.choice(TAGS, rng.integers(1, 6), replace=False)
+    )
+
+    return f"""<html><body>
+<div class="{opener_class}">{_sentence(rng, vocabulary, 30)}</div>
+<div {content_attr}>{"".join(paragraphs)}</div>
+<div class="authors"><span itemprop="name">{authors}</span></div>
+<div id="art-tags">{tags}</div>
+</body></html>"""
+
+
+def full_df_corpus(n_rows, seed=0):
+    """Generate a synthetic `full_df` dataframe as produced by `add_content()`
+
+    Args:
+        n_rows (int): Number of articles
+        seed (int, optional): Random seed, defaults to 0
+
+    Returns:
+        (pandas.core.frame.DataFrame): Dataframe with the columns described in `df_LEGEND.txt`
+    """
+    rng = np.random.default_rng(seed)
+    vocabulary = np.array(make_vocabulary(seed=seed))
+
+    def word_lists(n_words):
+        ranks = np.minimum(rng.zipf(1.3, (n_rows, n_words)), len(vocabulary)) - 1
+        return [sorted(vocabulary[row].tolist()) for row in ranks]
+
+    # Top 50 words of each article with Zipf-distributed counts
+    word_counter = []
+    for ranks in np.minimum(rng.zipf(1.2, (n_rows, 50)), len(vocabulary)) - 1:
+        words, counts = np.unique(vocabulary[ranks], return_counts=True)
+        order = np.argsort(-counts, kind="stable")
+        word_counter.append(list(zip(words[order].tolist(), counts[order].tolist())))
+
+    hours = rng.integers(6, 23, n_rows)
+    minutes = rng.integers(0, 60, n_rows)
+    time = pd.Series([f"{h:02d}:{m:02d}:00" for h, m in zip(hours, minutes)], dtype="object")
+    time[rng.random(n_rows) < 0.05] = pd.NA
+
+    links = [
+        f"/{rng.choice(SECTIONS)}/{rng.choice(SUBSECTIONS)}/clanek-{i}.A{i}" for i in range(n_rows)
+    ]
+    authors = rng.integers(0, 2**32, 500)
+
+    return pd.DataFrame(
+        {
+            "link": links,
+            "date": pd.to_datetime("2020-03-01")
+            + pd.to_timedelta(rng.integers(0, 1000, n_rows), unit="D"),
+            "time": time,
+            "title": word_lists(6),
+            "perex_short": word_lists(15),
+            "premium": False,
+            "video": False,
+            "gallery": False,
+            "perex_full": word_lists(25),
+            "word_counter": word_counter,
+            "authors_hash": [
+                rng.choice(authors, rng.integers(1, 3)).tolist() for _ in range(n_rows)
+            ],
+            "topics": [
+                [t.lower() for t in rng.choice(TAGS, rng.integers(1, 6), replace=False)]
+                for _ in range(n_rows)
+            ],
+        }
+    )
+
+
+def write_full_df_csvs(df, directory, rows_per_file=10000):
+    """Save a corpus as `full_df_<i>.csv` files readable by `csv_to_df()`
+
+    Args:
+        df (pandas.core.frame.DataFrame): Output of `full_df_corpus()`
+        directory (str): Output directory (has to end with a slash, as in `csv_to_df()`)
+        rows_per_file (int, optional): Number of rows in each file, defaults to 10000
+    """
+    for i, start in enumerate(range(0, len(df), rows_per_file)):
+        chunk = df.iloc[start: start + rows_per_file]
+        chunk.to_csv(join(directory, f"full_df_{i}.csv"))
@@ -0,0 +1,148 @@
+"""Run the pipeline benchmarks
+
+Times the main stages of the pipeline on the synthetic fixtures from
+`benchmarks/fixtures.py`, so no network access is needed. Each stage is run
+`--repeat` times and the fastest run is reported. The results can be stored as
+a baseline and later runs are compared against it, flagging every stage that
+got slower than the baseline by more than `--tolerance`.
+
+Run from the `tmc/` directory:
+
+    python -m benchmarks.run_benchmarks --save-baseline
+    python -m benchmarks.run_benchmarks --sizes 1000 10000 100000
+
+The script exits with status 1 if any stage regressed.
+"""
+
+import argparse
+import json
+import platform
+import tempfile
+from os.path import dirname, isfile, join
+from statistics import median
+from time import perf_counter
+from bs4 import BeautifulSoup
+import tmc_utils.article_scraper as arts
+from tmc_utils.clean_text import sentence_cleaner_cz
+from dynamic_join import csv_to_df
+import data_viz_tools as dvt
+from benchmarks import fixtures
+
+DEFAULT_BASELINE = join(dirname(__file__), "baseline.json")
+
+
+def time_stage(func, repeat):
+    """Run `func` `repeat` times and return the fastest and median wall time in seconds"""
+    timings = []
+    for _ in range(repeat):
+        start = perf_counter()
+        func()
+        timings.append(perf_counter() - start)
+    return {"min": min(timings), "median": median(timings)}
+
+
+def html_stages(repeat):
+    """Benchmark the stages working with HTML and raw text"""
+    list_html = fixtures.list_page_html(seed=1)
+    article_htmls = [fixtures.article_page_html(seed=i) for i in range(20)]
+    sentences = [
+        BeautifulSoup(html, "html.parser").find("p").text for html in article_htmls
+    ] * 10
+
+    return {
+        "generate_article_df": time_stage(
+            lambda: arts.generate_article_df(BeautifulSoup(list_html, "html.parser")), repeat
+        ),
+        "parse_article x20": time_stage(
+            lambda: [
+                arts.parse_article(BeautifulSoup(html, "html.parser")) for html in article_htmls
+            ],
+            repeat,
+        ),
+        "sentence_cleaner_cz x200": time_stage(
+            lambda: [sentence_cleaner_cz(sentence) for sentence in sentences], repeat
+        ),
+    }
+
+
+def corpus_stages(n_rows, repeat):
+    """Benchmark the stages working with a `full_df` corpus of `n_rows` articles"""
+    results = {}
+    with tempfile.TemporaryDirectory() as csv_dir:
+        fixtures.write_full_df_csvs(fixtures.full_df_corpus(n_rows), csv_dir)
+        results[f"csv_to_df @{n_rows}"] = time_stage(lambda: csv_to_df(csv_dir + "/"), repeat)
+        df = csv_to_df(csv_dir + "/")
+
+    results[f"create_all_words @{n_rows}"] = time_stage(
+        lambda: dvt.create_all_words(df, []), repeat
+    )
+    results[f"create_hourly_df @{n_rows}"] = time_stage(
+        lambda: dvt.create_hourly_df(df), repeat
+    )
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Return the stages slower than the baseline by more than `tolerance`"""
+    regressions = {}
+    for stage, timing in results.items():
+        if stage not in baseline:
+            continue
+        ratio = timing["min"] / baseline[stage]["min"]
+        if ratio > 1 + tolerance:
+            regressions[stage] = ratio
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[1000, 10000],
+        help="Numbers of articles in the synthetic corpora (1e3 to 1e6)",
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per stage")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Path to the baseline file")
+    parser.add_argument(
+        "--save-baseline", action="store_true", help="Store the results as the new baseline"
+    )
+    parser.add_argument(
+        "--tolerance", type=float, default=0.25,
+        help="Allowed relative slowdown before a stage is flagged, defaults to 0.25",
+    )
+    args = parser.parse_args()
+
+    results = html_stages(args.repeat)
+    for n_rows in args.sizes:
+        results.update(corpus_stages(n_rows, args.repeat))
+
+    baseline = {}
+    if isfile(args.baseline):
+        with open(args.baseline, encoding="utf-8") as file:
+            baseline = json.load(file)["results"]
+    regressions = compare(results, baseline, args.tolerance)
+
+    print(f"{'Stage':<32}{'min [s]':>12}{'median [s]':>12}{'vs baseline':>14}")
+    for stage, timing in results.items():
+        ratio = f"{timing['min'] / baseline[stage]['min']:.2f}x" if stage in baseline else "-"
+        flag = "  REGRESSION" if stage in regressions else ""
+        print(f"{stage:<32}{timing['min']:>12.4f}{timing['median']:>12.4f}{ratio:>14}{flag}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as file:
+            json.dump(
+                {
+                    "machine": platform.platform(),
+                    "python": platform.python_version(),
+                    "results": results,
+                },
+                file,
+                indent=2,
+            )
+        print(f"Baseline saved to {args.baseline}")
+
+    if regressions:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,21 +5,26 @@ visualization options, both static and interactive.
 
 The module contains the following functions:
 
-- create_all_words(df) - Concatenate Counter objects
+- create_all_words(df, words_to_delete, word_sketch=None) - Concatenate Counter objects
 - basic_wordcloud(all_words_df, width=15, height=10) - Plot a simple wordcloud
 - tree_map(all_words_df, top_n=30) - Plot a treemap of top 30 words
-- create_hourly_df(df, words_to_delete) - Produce a long dataframe of hours / words / counts
-- hourly_words_barplot(df_hourly_words_long, y_range, width=1000, height=600) - Interactive barplot
+- create_hourly_df(df) - Produce a long dataframe of hours / words / counts
+- hourly_words_barplot(df_hourly_words_long, y_range, width=1000, height=600,
+  animation_frame="hour", y="frequency", title=...) - Interactive barplot
+- trending_barplot(df, window="D", top_n=10, trending=None, start=None, end=None) - Interactive
+  barplot of the most trending words per day or week
 - hourly_density(article_df) - Density graph of hourly publications
-- time_stats(df) - Time statistics about articles
+- time_stats(df=None, times=None) - Time statistics about articles
 - hourly_bar(df) - Barplot of article counts at a given hour (all time)
 - line_plot(df) - Line plot of daily published articles
 - section_bar(df) - Dataframe of unique section frequencies
 - cases_df(df) - Dataframe of covid cases from covid19api.com
 - article_cases_plot(df, cases) - Overlaid line plot of articles and covid cases
-- sankey_diagram(df, top_n=25) - Interactive Sankey plot of authors and sections
+- sankey_diagram(edges, top_n=25, start=None, end=None) - Interactive Sankey plot of authors
+  and sections
 """
 from functools import reduce
+from collections import Counter
 import plotly.express as px
 import plotly.graph_objects as go
 import matplotlib.pyplot as plt
@@ -27,20 +32,38 @@ import pandas as pd
 from wordcloud import WordCloud
 import numpy as np
 import requests
+from tmc_utils import profiling
+from tmc_utils.author_graph import top_author_sections
+from tmc_utils.publication_time import PublicationTimes, format_minutes
+from tmc_utils.trending import TrendingTerms
 
 
-def create_all_words(df, words_to_delete):
+@profiling.stage("create_all_words")
+def create_all_words(df, words_to_delete, word_sketch=None):
     """Join all Counter objects into one and delete specific words
 
+    Example:
+        # Without loading the articles, in fixed memory
+        sketch = dynamic_join.word_sketch_from_csv("data/full_dfs/", capacity=1000)
+        all_words = create_all_words(None, [], word_sketch=sketch)
+
     Args:
-        df (pandas.core.frame.DataFrame): Output of `dynamic_join.py`
+        df (pandas.core.frame.DataFrame): Output of `dynamic_join.py`, not needed with
+            `word_sketch`
         words_to_delete (list): List of words to delete
+        word_sketch (tmc_utils.word_sketch.SpaceSaving, optional): Sketch of approximate word
+            counts (e.g. from `dynamic_join.word_sketch_from_csv()` or `run_pipeline()`) used
+            instead of counting the words of `df` exactly
 
     Returns:
         all_words (collections.Counter): Counter object of most frequent words
     """
-
-    all_words = reduce(lambda a, b: a + b, df.word_counter.dropna())
+    if word_sketch is not None:
+        all_words = Counter(dict(word_sketch.top()))
+    else:
+        all_words = Counter()
+        for counter in df.word_counter.dropna():
+            all_words.update(counter)
 
     # Delete a defined list of words
     if len(words_to_delete) > 0:
@@ -89,12 +112,15 @@ def tree_map(all_words_df, top_n=30):
     treefig.show()
 
 
-def create_hourly_df(df, words_to_delete):
+@profiling.stage("create_hourly_df")
+def create_hourly_df(df):
     """Create a per-hour dataframe of top 10 words and their counts
 
+    Raw frequencies favour words that are always common, use `trending_barplot()`
+    (`tmc_utils.trending.TrendingTerms`) to find the words standing out in a day or week.
+
     Args:
         df (pandas.core.frame.DataFrame): Dataframe of articles
-        words_to_delete (list): List of words to be deleted (e.g. common words)
 
     Returns:
         df_hourly_words_long (pandas.core.frame.DataFrame): Long dataframe of hours / words / counts
@@ -107,13 +133,6 @@ def create_hourly_df(df, words_to_delete):
 
     df_hourly = pd.DataFrame(list_hourly, columns=["hour", "words"])
 
-    # Delete a defined list of words
-    if len(words_to_delete) > 0:
-        for i in df_hourly.index:
-            for word in words_to_delete:
-                if word in df_hourly.words.iloc[i]:
-                    del df_hourly.words.iloc[i][word]
-
     # Split the counter object into words and frequencies only
     list_top_w = []
     list_top_f = []
@@ -141,14 +160,26 @@ def create_hourly_df(df, words_to_delete):
     return df_hourly_words_long
 
 
-def hourly_words_barplot(df_hourly_words_long, y_range: list, width=1000, height=600):
+def hourly_words_barplot(
+    df_hourly_words_long,
+    y_range: list,
+    width=1000,
+    height=600,
+    animation_frame="hour",
+    y="frequency",
+    title="Most frequent words per hour",
+):
     """Generate an interactive barchart using `plotly`
 
     Args:
         df_hourly_words_long (pandas.core.frame.DataFrame): Dataframe produced by `create_hourly_df()`
+            or `TrendingTerms.trending_df()`
         y_range (list): Range of the y axis (frequency of words)
         width (int, optional): Figure width in pixels, defaults to 1000
         height (int, optional): Figure height in pixelsm, defaults to 600
+        animation_frame (str, optional): Column with animation frames, defaults to "hour"
+        y (str, optional): Column with bar heights, defaults to "frequency"
+        title (str, optional): Figure title, defaults to "Most frequent words per hour"
 
     Returns:
         Interactive barchart
@@ -156,12 +187,12 @@ def hourly_words_barplot(df_hourly_words_long, y_range: list, width=1000, height
     fig = px.bar(
         df_hourly_words_long,
         x="word",
-        y="frequency",
-        animation_frame="hour",
+        y=y,
+        animation_frame=animation_frame,
         width=width,
         height=height,
         range_y=y_range,
-        title="Most frequent words per hour",
+        title=title,
     )
     fig.update_traces(
         marker_line_color="rgb(10, 45, 100)",
@@ -172,6 +203,45 @@ def hourly_words_barplot(df_hourly_words_long, y_range: list, width=1000, height
     fig.show()
 
 
+def trending_barplot(df, window="D", top_n=10, trending=None, start=None, end=None):
+    """Plot the most trending words of each day or week as an interactive barchart
+
+    Unlike the most frequent words, trending words don't need a list of words to delete,
+    see `tmc_utils.trending` for how the scores are computed.
+
+    Args:
+        df (pandas.core.frame.DataFrame): Dataframe of articles, only used when `trending` is None
+        window (str, optional): Window of the scores, "D" (day) or "W" (week), defaults to "D"
+        top_n (int, optional): Number of words per window, defaults to 10
+        trending (tmc_utils.trending.TrendingTerms, optional): Prebuilt scorer, built from `df`
+            if not supplied
+        start (str or datetime, optional): First window (inclusive)
+        end (str or datetime, optional): Last window (inclusive)
+
+    Returns:
+        Interactive barchart
+    """
+    if trending is None:
+        trending = TrendingTerms(window=window)
+        trending.add(df)
+    trending_words = trending.trending_df(top_n, start, end)
+    if len(trending_words) == 0:
+        print("Not enough windows to score the words against a baseline.")
+        return
+
+    # Words below their baseline have negative scores, the axis has to include them
+    low = min(0, trending_words.score.min())
+    high = max(0, trending_words.score.max())
+    padding = (high - low) * 0.1 or 1
+    hourly_words_barplot(
+        trending_words,
+        [low - padding if low < 0 else 0, high + padding],
+        animation_frame="period",
+        y="score",
+        title="Most trending words" + {"D": " per day", "W": " per week"}.get(trending.window, ""),
+    )
+
+
 def hourly_density(article_df):
     """Plot a density function of the distribution of articles in daytime.
 
@@ -188,46 +258,32 @@ def hourly_density(article_df):
     plt.title("Density of publications")
 
 
-def time_stats(df):
+def time_stats(df=None, times=None):
     """Function performing descriptive statistics about the time when given articles were published.
 
     Args:
-        df (pandas.core.frame.DataFrame): Dataframe of articles
+        df (pandas.core.frame.DataFrame, optional): Dataframe of articles, only used when `times`
+            is None
+        times (tmc_utils.publication_time.PublicationTimes, optional): Accumulated publication
+            times, e.g. several per-list accumulators merged with `+`
 
     Returns:
         Time stats about articles
     """
-    hour, mins = df.time_hour.dropna(), df.time_min.dropna()
+    if times is None:
+        times = PublicationTimes.from_df(df)
 
-    # Convert time to decimals in order to perform descriptive statistics
-    daytime = hour.astype("str") + ":" + mins.astype("str")
-    daytime_serie = [
-        round(float(t[0]) + float(t[1]) / 60, 2)
-        for t in [t.split(":") for t in daytime]
-    ]
-
-    # Compute mean and median and Covert them back to time format
-    splitted = [
-        str(stat).split(".")
-        for stat in [
-            round(np.mean(daytime_serie), 2),
-            round(np.median(daytime_serie), 2),
-        ]
-    ]
+    # Least and most active hours are only taken from hours with any publications
+    hourly = times.hourly_histogram()
+    hourly = hourly[hourly > 0].sort_values(ascending=False, kind="stable")
 
     # Data are stored as dictionary
-    stats = dict(
-        zip(
-            ["Mean time of publication", "Median Time of publication"],
-            [[":".join([t[0], str(round(float(t[1]) * 0.6))])] for t in splitted],
-        )
-    )
-    stats["Least active daily hour"] = [
-        str(df.time_hour.value_counts().index[-1]) + ":" + "00"
-    ]
-    stats["Most active daily hour"] = [
-        str(df.time_hour.value_counts().index[0]) + ":" + "00"
-    ]
+    stats = {
+        "Mean time of publication": [format_minutes(times.mean())],
+        "Median Time of publication": [format_minutes(times.median())],
+        "Least active daily hour": [f"{hourly.index[-1]}:00"],
+        "Most active daily hour": [f"{hourly.index[0]}:00"],
+    }
 
     # Convert data to df and then transpose to obtain better readability
     stats_df = pd.DataFrame(stats).T
@@ -348,29 +404,27 @@ def article_cases_plot(df, cases):
     plt.show()
 
 
-def sankey_diagram(df, top_n=25):
+def sankey_diagram(edges, top_n=25, start=None, end=None):
     """Plot a Sankey diagram of authors and sections contributed to.
 
+    Example:
+        edges = load_author_section_counts("data/author_section_counts.csv")
+        sankey_diagram(edges, start="2022-01-01")
+
     Args:
-        df (pandas.core.frame.DataFrame): Dataframe of articles
+        edges (pandas.core.frame.DataFrame): Edge table kept up to date by `get_data.py`, see
+            `author_graph.load_author_section_counts()`
         top_n (int, optional): Top sections by article count, defaults to 25
+        start (str or datetime, optional): First day of the time window (inclusive)
+        end (str or datetime, optional): Last day of the time window (inclusive)
 
     Returns:
         Interactive Sankey diagram
     """
-    # Author hashes are in a list (multiple authors for a single article)
-    df_authors = df.explode("authors_hash")
-    df_authors["section"] = df_authors.link.apply(lambda x: x.split("/")[1])
     # Top 25 authors
-    authors_section_counts = (
-        df_authors.groupby(["authors_hash", "section"])
-        .size()
-        .reset_index(name="link")
-        .nlargest(top_n, "link")
-    )
-    authors_section_counts = authors_section_counts.rename(columns={"link": "count"})
+    authors_section_counts = top_author_sections(edges, top_n, start, end)
     # Shorthen hash to the last 5 digits
-    authors_section_counts["author_small"] = authors_section_counts.authors_hash.apply(
+    authors_section_counts["author_small"] = authors_section_counts.author_id.apply(
         lambda x: str(x)[-5:]
     )
 
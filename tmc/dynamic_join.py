@@ -6,12 +6,24 @@ generated by the `get_data.py` module.
 The module contains the following functions:
 
 - `str_to_list(item)` - Converts a string of a list to a list
-- `csv_to_df(CSV_PATH)` - Join .csv files into a dataframe
+- `csv_to_df(CSV_PATH, lsh=None)` - Join .csv files into a dataframe
+- `word_sketch_from_csv(CSV_PATH, capacity=1000, chunksize=1000)` - Count the words of .csv files
+  approximately in fixed memory
+- `csv_to_df_indexed(CSV_PATH, index_file="inverted_index.npz", lsh=None)` - Join .csv files
+  into a dataframe and load or build its inverted index
+- `csv_query(CSV_PATH, index_file="inverted_index.npz", lsh=None, **query)` - Load only the
+  articles matching a query of the inverted index
 """
 from os import listdir
+from os.path import isfile
 from collections import Counter
 import ast
+import re
 import pandas as pd
+from tmc_utils import profiling
+from tmc_utils.near_duplicates import mark_near_duplicates
+from tmc_utils.inverted_index import InvertedIndex, fingerprint
+from tmc_utils.word_sketch import SpaceSaving
 
 
 def str_to_list(item: str):
@@ -19,28 +31,39 @@ def str_to_list(item: str):
     return ast.literal_eval(item) if isinstance(item, str) else pd.NA
 
 
-def csv_to_df(CSV_PATH: str):
-    """Get all .csv files in the defined directory and return a dataframe
+def _csv_files(CSV_PATH):
+    """.csv files ordered by their list number (`full_df_<i>.csv`), not in the listdir() order"""
+    csv_files = filter(lambda f: f.endswith(".csv"), listdir(CSV_PATH))
+    return sorted(csv_files, key=lambda f: ([int(n) for n in re.findall(r"\d+", f)], f))
 
-    Returns:
-        pandas.core.frame.DataFrame: Dataframe with correct data types
-    """
-    csv_dir = listdir(CSV_PATH)
-    csv_files = list(filter(lambda f: f.endswith(".csv"), csv_dir))
-    
-    if len(csv_files) == 0:
-        print("No CSV files found.")
-        return None
 
-    # Load first and append the rest
-    df = pd.read_csv(CSV_PATH + csv_files[0], index_col=0)
+def _list_number(file):
+    """List number in the name of a .csv file, e.g. 289 for `full_df_289.csv`"""
+    numbers = re.findall(r"\d+", file)
+    return int(numbers[-1]) if numbers else pd.NA
+
 
-    for file in csv_files[1:]:
+def _join_csv_files(CSV_PATH, csv_files, rows=None, lsh=None):
+    """Join .csv files (only the row positions in `rows[file]` if supplied) with correct types
+
+    Returns:
+        df (pandas.core.frame.DataFrame): Joined dataframe
+        lengths (list): Number of rows joined from each file
+    """
+    dfs = []
+    for file in csv_files:
         temp_df = pd.read_csv(CSV_PATH + file, index_col=0, na_values=pd.NA)
-        df = pd.concat([df, temp_df], axis=0)
+        temp_df = temp_df if rows is None else temp_df.iloc[rows[file]]
+        dfs.append(temp_df.assign(list_number=_list_number(file)))
+    lengths = [len(temp_df) for temp_df in dfs]
+    df = pd.concat(dfs, axis=0)
 
-    # Manually set the type of the date column
+    # The index of each file is the position of the article in its list
+    df["list_number"] = df["list_number"].astype("Int64")
+    df["list_position"] = df.index.astype("int64")
     df = df.reset_index(drop=True)
+
+    # Manually set the type of the date column
     df["date"] = pd.to_datetime(df["date"])
 
     # Convert the time column into two integer cols: hours and minutes
@@ -67,4 +90,139 @@ def csv_to_df(CSV_PATH: str):
         else pd.NA
     )
 
-    return df
+    if lsh is not None:
+        df = mark_near_duplicates(df, lsh)
+
+    return df, lengths
+
+
+@profiling.stage("csv_to_df")
+def csv_to_df(CSV_PATH: str, lsh=None):
+    """Get all .csv files in the defined directory and return a dataframe
+
+    The files are joined in the order of their list numbers. The list number
+    and the position in the list of each article are kept in the
+    `list_number` and `list_position` columns.
+
+    Args:
+        CSV_PATH (str): Directory with the .csv files
+        lsh (tmc_utils.near_duplicates.MinHashLSH, optional): Index used to mark near-duplicate
+            articles in a `dup_cluster` column
+
+    Returns:
+        pandas.core.frame.DataFrame: Dataframe with correct data types
+    """
+    csv_files = _csv_files(CSV_PATH)
+
+    if len(csv_files) == 0:
+        print("No CSV files found.")
+        return None
+
+    return _join_csv_files(CSV_PATH, csv_files, lsh=lsh)[0]
+
+
+def word_sketch_from_csv(CSV_PATH: str, capacity=1000, chunksize=1000):
+    """Count the words of all .csv files in the defined directory approximately in fixed memory
+
+    Only the `word_counter` column is read, in chunks of `chunksize` rows, so
+    neither the dataframe nor the Counters of all articles are ever in memory.
+
+    Args:
+        CSV_PATH (str): Directory with the .csv files
+        capacity (int, optional): Number of words tracked by the sketch, defaults to 1000
+        chunksize (int, optional): Number of rows read at once, defaults to 1000
+
+    Returns:
+        (tmc_utils.word_sketch.SpaceSaving): Sketch of the most frequent words
+    """
+    sketch = SpaceSaving(capacity)
+    for file in _csv_files(CSV_PATH):
+        chunks = pd.read_csv(CSV_PATH + file, usecols=["word_counter"], chunksize=chunksize)
+        for chunk in chunks:
+            for word_counter in chunk.word_counter.dropna():
+                sketch.update_counter(dict(ast.literal_eval(word_counter)))
+    return sketch
+
+
+def _index_of_csv_files(CSV_PATH, csv_files, index_file, lsh=None):
+    """Load the index if the files haven't changed since it was built, otherwise rebuild it
+
+    Returns:
+        index (tmc_utils.inverted_index.InvertedIndex): Index of the files
+        df (pandas.core.frame.DataFrame): Joined files if they had to be loaded, otherwise None
+    """
+    index_path = CSV_PATH + index_file
+    # Only the file metadata is checked, the articles aren't loaded for it
+    if isfile(index_path):
+        index = InvertedIndex.load(index_path)
+        if index.checksum == fingerprint([CSV_PATH + file for file in csv_files]):
+            return index, None
+        print("The inverted index is out of date. Rebuilding.")
+
+    df, lengths = _join_csv_files(CSV_PATH, csv_files, lsh=lsh)
+    with profiling.stage("inverted_index"):
+        index = InvertedIndex.build(
+            df, [(CSV_PATH + file, length) for file, length in zip(csv_files, lengths)]
+        )
+    index.save(index_path)
+    return index, df
+
+
+def csv_to_df_indexed(CSV_PATH: str, index_file="inverted_index.npz", lsh=None):
+    """Join .csv files into a dataframe and load or build its inverted index
+
+    The index is stored next to the .csv files and rebuilt whenever any of the
+    files has been added, removed, or rewritten since it was built.
+
+    Args:
+        CSV_PATH (str): Directory with the .csv files
+        index_file (str, optional): File name of the index, defaults to "inverted_index.npz"
+        lsh (tmc_utils.near_duplicates.MinHashLSH, optional): See `csv_to_df()`
+
+    Returns:
+        df (pandas.core.frame.DataFrame): Dataframe with correct data types
+        index (tmc_utils.inverted_index.InvertedIndex): Index of words, topics, and authors
+    """
+    csv_files = _csv_files(CSV_PATH)
+    if len(csv_files) == 0:
+        print("No CSV files found.")
+        return None, None
+
+    index, df = _index_of_csv_files(CSV_PATH, csv_files, index_file, lsh)
+    if df is None:
+        df = csv_to_df(CSV_PATH, lsh)
+    return df, index
+
+
+def csv_query(CSV_PATH: str, index_file="inverted_index.npz", lsh=None, **query):
+    """Load only the articles matching a query of the inverted index
+
+    Only the .csv files containing matching articles are read, the index is
+    loaded or built as in `csv_to_df_indexed()`.
+
+    Example:
+        df = csv_query("data/full_dfs/", all_of=[("topic", "koronavirus")], start="2022-01-01")
+
+    Args:
+        CSV_PATH (str): Directory with the .csv files
+        index_file (str, optional): File name of the index, defaults to "inverted_index.npz"
+        lsh (tmc_utils.near_duplicates.MinHashLSH, optional): See `csv_to_df()`
+        **query: Keyword arguments of `InvertedIndex.query()`
+
+    Returns:
+        pandas.core.frame.DataFrame: Matching articles with correct data types, in the order of
+            `csv_to_df()`
+    """
+    csv_files = _csv_files(CSV_PATH)
+    if len(csv_files) == 0:
+        print("No CSV files found.")
+        return None
+
+    index, df = _index_of_csv_files(CSV_PATH, csv_files, index_file)
+    ids = index.query(**query)
+    if df is not None:
+        df = df.iloc[ids].reset_index(drop=True)
+        return df if lsh is None else mark_near_duplicates(df, lsh)
+    # Without any matches the columns are still taken from a file
+    rows = index.locate(ids) or {csv_files[0]: []}
+    return _join_csv_files(CSV_PATH, list(rows), rows, lsh)[0]
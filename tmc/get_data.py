@@ -5,34 +5,69 @@ proxy is established, if possible. Then the user specifies the list start and
 list end of the article list in question. The user is then informed about the
 minimum amount of time the process will take (given that no rate limiting
 takes place). Consent needs to be given in order to continue the script.
-Finally, the script first collects the article lists and then processes public
-articles as specified in `article_scraper.py`.
+Finally, the script collects the article lists and processes their public
+articles as specified in `article_scraper.py`, streaming them through the
+stages of `tmc_utils/pipeline.py`.
 """
 # %%
-from os import chdir
+import argparse
+from os import chdir, makedirs
 from os.path import dirname, abspath
-from random import uniform
-from time import sleep
 import requests
-import pandas as pd
 import tmc_utils.tor_initialization as ti
-import tmc_utils.article_scraper as arts
+import tmc_utils.author_graph as ag
+import tmc_utils.author_ids as ai
+from tmc_utils import metrics, pipeline, profiling
+from tmc_utils.html_archive import HtmlArchive
 
 
 # Set working directory to filepath
 chdir(dirname(abspath(__file__)))
 
+# Authors are stored as ids hashed with a secret key, the same one in every run
+ai.ensure_author_key("data/author_key")
+
+# Profile the stages when run with `--profile [DIR]` (or with TMC_PROFILE set)
+parser = argparse.ArgumentParser(description="Get article data")
+parser.add_argument(
+    "--profile", nargs="?", const="profiles", metavar="DIR", help="Write profiles to DIR"
+)
+parser.add_argument(
+    "--profile-cpu-only", action="store_true", help="Don't trace memory allocations"
+)
+# Ignore arguments of e.g. Jupyter when run cell by cell
+args, _ = parser.parse_known_args()
+if args.profile is not None:
+    profiling.enable(args.profile, memory=not args.profile_cpu_only)
+
+# Record per-stage metrics (fetch latency, Archive.org hits, parse time, ...)
+makedirs("data/metrics", exist_ok=True)
+metrics.register_hook(metrics.JsonLinesWriter("data/metrics/metrics.jsonl"))
+metrics.register_hook(metrics.PrometheusTextfile("data/metrics/tmc.prom"))
+
+# Keep the fetched HTML so that it can be re-parsed offline using `tmc_utils/reprocess.py`
+makedirs("data/archive", exist_ok=True)
+html_archive = HtmlArchive("data/archive/html_archive.gz")
+
 # %%
-# Initialize TOR
+# Initialize TOR with several isolated circuits used round-robin
+TOR_CIRCUITS = 4
+TOR_SOCKS_PORT = 9060
+TOR_CONTROL_PORT = 9051
+tor_process = None
+
 if ti.tor_available():
     try:
-        ti.initiate_tor()
-    # Reinitiate TOR if it is running in the background
+        tor_process = ti.initiate_tor(TOR_CIRCUITS, TOR_SOCKS_PORT, TOR_CONTROL_PORT)
+    # Reinitiate TOR if a previous run left it running in the background
     except OSError:
         ti.kill_tor_process()
-        ti.initiate_tor()
-    tor_request = ti.get_tor_session()
-    print("Tor IP:", tor_request.get("http://httpbin.org/ip", timeout=30).text)
+        tor_process = ti.initiate_tor(TOR_CIRCUITS, TOR_SOCKS_PORT, TOR_CONTROL_PORT)
+    tor_request = ti.TorCircuitPool(
+        range(TOR_SOCKS_PORT, TOR_SOCKS_PORT + TOR_CIRCUITS), TOR_CONTROL_PORT
+    )
+    for port, tor_ip in tor_request.check_health().items():
+        print(f"Tor IP (port {port}):", tor_ip)
     print("Actual IP:", requests.get("http://httpbin.org/ip", timeout=30).text)
 else:
     tor_request = None
@@ -84,36 +119,42 @@ while True:
 
 if CONSENT == "N":
     print("Exiting.")
-    ti.kill_tor_process()
+    if tor_process is not None:
+        ti.kill_tor_process(tor_process)
     raise SystemExit
 
 # %%
-# First, obtain the list of article lists and save them as partial dfs
-for i in range(LIST_START, LIST_END):
-    print(f"PAGE LIST NUMBER: {i} / {LIST_END - 1}")
-    URL = "https://www.idnes.cz/zpravy/zahranicni/koronavirus.K466979/" + str(i)
-    soup = arts.soup_object_tor(URL, tor_request)
-    article_df = arts.generate_article_df(soup)
-    print(f"List number {i} processed. Saving the resulting dataframe.\n")
-    article_df.to_csv(f"data/partial_dfs/partial_df_{i}.csv")
-    sleep(round(uniform(5, 10), 3))
+# Stream the article lists and their articles: articles of a list are fetched (using all TOR
+# circuits) while the next lists are being requested, and each is saved as soon as it's processed
+makedirs("data/partial_dfs", exist_ok=True)
+makedirs("data/full_dfs", exist_ok=True)
+AUTHOR_EDGES_PATH = "data/author_section_counts.csv"
+author_edges = ag.load_author_section_counts(AUTHOR_EDGES_PATH)
+AUTHOR_BRIDGE_PATH = "data/author_bridge.csv"
+author_bridge = ai.load_author_bridge(AUTHOR_BRIDGE_PATH)
+AUTHORS_PATH = "data/authors.csv"
+
+
+def update_author_edges(list_number, full_df):
+    """Keep the author / section edge table and the author tables in sync"""
+    global author_edges, author_bridge
+    # The edge counts subtract the articles that are already in the bridge
+    author_edges = ag.update_author_section_counts(author_edges, author_bridge, full_df)
+    ag.save_author_section_counts(author_edges, AUTHOR_EDGES_PATH)
+    author_bridge = ai.update_author_bridge(author_bridge, full_df)
+    ai.save_author_bridge(author_bridge, AUTHOR_BRIDGE_PATH)
+    ai.save_author_dimension(ai.author_dimension_from_bridge(author_bridge), AUTHORS_PATH)
 
-# %%
-# Persist cleaned pages without accessing idnes.cz directly due to the high number of requests
-for i in range(LIST_START, LIST_END):
-    print(f"PAGE LIST NUMBER: {i} / {LIST_END - 1}\n")
-    temp_df = pd.read_csv(
-        "data/partial_dfs/partial_df_" + str(i) + ".csv",
-        index_col=0,
-        na_values=pd.NA
-    )
-    # Create article dataframe
-    cat_and_artcls = arts.add_content(temp_df, tor_request)
-    print(f"\nList number {i} processed. Saving the resulting dataframe.\n")
-    cat_and_artcls.to_csv(f"data/full_dfs/full_df_{i}.csv")
-    # Sleep so that the user has time to read the message
-    sleep(2)
+
+pipeline.run_pipeline(
+    range(LIST_START, LIST_END),
+    "https://www.idnes.cz/zpravy/zahranicni/koronavirus.K466979/{}",
+    tor_request,
+    archive=html_archive,
+    on_list_done=update_author_edges,
+)
 
 # %%
-if ti.tor_available():
-    ti.kill_tor_process()
+if tor_process is not None:
+    tor_request.close()
+    ti.kill_tor_process(tor_process)
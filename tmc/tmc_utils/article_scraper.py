@@ -2,38 +2,119 @@
 
 Produces a dataframe with article details such as title, date, or link. Any
 meaningful text is pre-processed using the `clean_text` module. Note that it
-is tailored to a specific HTML structure of idnes.cz.
+is tailored to a specific HTML structure of idnes.cz, described by the
+extraction specs `IDNES_LIST_SPEC` and `IDNES_ARTICLE_SPEC` (see `extractor.py`).
 
 The module contains the following functions:
 
-- `soup_object_tor(link, tor_request_obj)` - Parses a TOR request
-- `soup_object_request_all(link, tor_request_obj=None)` - Requests Archive.org before TOR or Google Webcache
+- `soup_object_tor(link, tor_request_obj, archive=None)` - Parses a TOR request
+- `soup_object_request_all(link, tor_request_obj=None, archive=None, snapshots=None)` -
+   Requests Archive.org before TOR or Google Webcache
+- `wayback_snapshots(links, tor_request_obj=None, date_from=None, date_to=None)` - Resolves
+   Archive.org snapshots of many links using the CDX API
+- `article_from_record(record)` - Cleans a single record extracted using `IDNES_LIST_SPEC`
+- `article_df_from_records(records)` - Generates a dataframe of article properties from
+   records extracted using `IDNES_LIST_SPEC`
 - `generate_article_df(soup_object)` - Generates a dataframe of article properties
-- `add_content(article_df, tor_requests_obj, sleeping=(10, 15))` - Adds content
-   and other attributes to the df from the function `generate_article_df`
+- `article_from_fields(fields)` - Cleans the fields extracted from an article page using
+   `IDNES_ARTICLE_SPEC`
+- `parse_article(soup_page)` - Extracts the content and other attributes of an article page
+- `add_content(article_df, tor_requests_obj, sleeping=(10, 15), word_sketch=None,
+   archive=None, prefetch_snapshots=True)` - Adds content and other attributes to the df
+   from the function `generate_article_df`
 """
 
-from time import sleep
-from random import uniform
+from time import perf_counter
 from collections import Counter
 from itertools import chain
+from urllib.parse import urlparse, urlencode
 import datetime
+import re
 import requests
 import pandas as pd
 from tmc_utils.clean_text import sentence_cleaner_cz
+from tmc_utils import metrics, profiling
+from tmc_utils.http_session import direct_session, THROTTLE
+from tmc_utils.extractor import Extractor
+from tmc_utils.author_ids import author_id
 from bs4 import BeautifulSoup
 
-
-def soup_object_tor(link, tor_request_obj=None, SKIP_CONSENT=False):
+# Article lists, e.g. https://www.idnes.cz/zpravy/archiv/1
+IDNES_LIST_SPEC = {
+    "items": "div#list-art-count div.art",
+    "fields": {
+        "link": {"select": "a.art-link[href]", "attr": "href"},
+        "datetime": {"select": "span.time", "attr": "datetime"},
+        "title": {"select": "a.art-link h3"},
+        "perex": {"select": "p.perex"},
+        "premium": {"select": "p.perex a.premlab", "exists": True},
+        "video": {"select": "a[score-type='Video']", "exists": True},
+    },
+}
+
+# Article pages, some subpages use different names for the opening paragraph and content
+IDNES_ARTICLE_SPEC = {
+    "fields": {
+        "perex_full": {"select": ["div.opener", "div.excert"]},
+        "content": {"select": ["div#art-text", "div.content"], "within": "p:not([class])"},
+        "authors": {"select": "div.authors span[itemprop='name']"},
+        "topics": {"select": "div#art-tags", "within": "a"},
+    },
+}
+
+LIST_EXTRACTOR = Extractor(IDNES_LIST_SPEC)
+ARTICLE_EXTRACTOR = Extractor(IDNES_ARTICLE_SPEC)
+
+
+def _timed_get(requester, link, via, throttle=True):
+    """Send a GET request through `requester` and emit the fetch metrics
+
+    Only the responses of page fetches (`throttle=True`) adjust `THROTTLE`,
+    which paces the page fetches. Rate limiting of lookups (Archive.org
+    availability and CDX APIs) says nothing about the pages.
+    """
+    host = urlparse(link).hostname
+    with metrics.timed("fetch_seconds", host=host, via=via):
+        req = requester.get(link, timeout=30)
+    metrics.observe("fetch_bytes", len(req.content), host=host)
+    metrics.count("fetch_responses", host=host, status=req.status_code)
+    if throttle:
+        THROTTLE.record(req)
+    return req
+
+
+def _parse_html(text, archive=None, url=None, kind=None, **meta):
+    """Optionally store an HTML document in `archive`, then parse it and emit the parse time"""
+    if archive is not None:
+        archive.append(url, text, kind, **meta)
+    with metrics.timed("parse_seconds"):
+        return BeautifulSoup(text, "html.parser")
+
+
+def soup_object_tor(
+    link,
+    tor_request_obj=None,
+    SKIP_CONSENT=False,
+    archive=None,
+    kind="list",
+    original_link=None,
+    **meta
+):
     """Send a request through TOR and parse it using BeautifulSoup
 
     Args:
         link (str): Webpage URL
         tor_request_obj (requests.sessions.Session): TOR requests object
         SKIP_CONSENT (bool): Whether or not to skip the prompt to
+        archive (tmc_utils.html_archive.HtmlArchive, optional): Archive to store the
+            fetched page in
+        kind (str, optional): Kind of the page stored in the archive, defaults to "list"
+        original_link (str, optional): URL stored in the archive if `link` is a mirror
+            (e.g. an Archive.org snapshot), defaults to `link`
+        **meta: Additional metadata stored in the archive, e.g. `list_number=289`
 
     Returns:
-        (bs4.BeautifulSoup): Parsed HTML document using BeautifulSoup
+        (bs4.BeautifulSoup): Parsed HTML document using BeautifulSoup, None if the request failed
     """
 
     # Give option to not route through TOR
@@ -48,50 +129,77 @@ def soup_object_tor(link, tor_request_obj=None, SKIP_CONSENT=False):
             if CONSENT == "N":
                 print("Pass a TOR requests object.")
                 raise SystemExit
-            req = requests.get(link, timeout=30)
-            return BeautifulSoup(req.text, "html.parser")
+        req = _timed_get(direct_session(), link, "direct")
+    else:
+        req = _timed_get(tor_request_obj, link, "tor")
 
-    req = tor_request_obj.get(
-        link,
-        timeout=30,
-    )
-    return BeautifulSoup(req.text, "html.parser")
+    # Don't parse error pages as if they were content
+    if not req.ok:
+        print(f"Request failed with status {req.status_code}: {link}. Outputting None.")
+        return None
+    return _parse_html(req.text, archive, original_link or link, kind, **meta)
 
 
-def soup_object_request_all(link, tor_request_obj=None, SKIP_CONSENT=False):
+def soup_object_request_all(
+    link, tor_request_obj=None, SKIP_CONSENT=False, archive=None, snapshots=None
+):
     """Request Archive.org before using TOR or Google Webcache and return a BeautifulSoup object
 
     Args:
         link (str): Webpage URL
         tor_request_obj (requests.sessions.Session): TOR requests object
         SKIP_CONSENT (bool): Whether or not to skip the prompt to
+        archive (tmc_utils.html_archive.HtmlArchive, optional): Archive to store the fetched
+            page in under `link`
+        snapshots (dict, optional): Output of `wayback_snapshots()`, if supplied, links missing
+            from it are treated as not archived instead of asking Archive.org one by one
 
     Returns:
         (bs4.BeautifulSoup): Parsed HTML document using BeautifulSoup
     """
 
-    # Use one of Archive.org's APIs to ask if the article is available, prefer TOR
-    archive_link = "http://archive.org/wayback/available?url=" + link
-    if tor_request_obj is not None:
-        archive_json = tor_request_obj.get(archive_link, timeout=30).json()
+    if snapshots is not None:
+        # Snapshots have been resolved in bulk by `wayback_snapshots()`
+        snapshot_url = snapshots.get(_url_key(link))
+        archived = snapshot_url is not None
     else:
-        archive_json = requests.get(archive_link, timeout=30).json()
-    archived = len(archive_json["archived_snapshots"]) != 0
+        # Use one of Archive.org's APIs to ask if the article is available, prefer TOR
+        archive_link = "http://archive.org/wayback/available?url=" + link
+        if tor_request_obj is not None:
+            req = _timed_get(tor_request_obj, archive_link, "tor", throttle=False)
+        else:
+            req = _timed_get(direct_session(), archive_link, "direct", throttle=False)
+        # Treat failed lookups (e.g. rate limiting) as if there was no snapshot
+        archive_json = req.json() if req.ok else {"archived_snapshots": {}}
+        archived = len(archive_json["archived_snapshots"]) != 0
+        snapshot_url = None
+        if archived and archive_json["archived_snapshots"]["closest"]["available"]:
+            snapshot_url = archive_json["archived_snapshots"]["closest"]["url"]
 
     # Continue if the website is available on Archive.org
-    if archived and archive_json["archived_snapshots"]["closest"]["available"]:
+    if snapshot_url is not None:
+        metrics.count("wayback_lookups", result="hit")
         # Use TOR to access Archive.org
         if tor_request_obj is not None:
             print("Found a snapshot on Archive.org. Using TOR to request the page.")
             return soup_object_tor(
-                archive_json["archived_snapshots"]["closest"]["url"],
+                snapshot_url,
                 tor_request_obj,
-                SKIP_CONSENT
+                SKIP_CONSENT,
+                archive,
+                kind="article",
+                original_link=link,
+                source="archive.org"
             )
         # Otherwise, fallback to no TOR
-        req = requests.get(archive_json["archived_snapshots"]["closest"]["url"], timeout=30)
+        req = _timed_get(direct_session(), snapshot_url, "direct")
         print("Found a snapshot on Archive.org. Accessing directly.")
-        return BeautifulSoup(req.text, "html.parser")
+        if not req.ok:
+            print(f"Request failed with status {req.status_code}. Outputting None.")
+            return None
+        return _parse_html(req.text, archive, link, "article", source="archive.org")
+
+    metrics.count("wayback_lookups", result="miss")
 
     # Try Google Webcache with no TOR otherwise (TOR gets rate limited)
     if not archived and tor_request_obj is not None:
@@ -99,15 +207,149 @@ def soup_object_request_all(link, tor_request_obj=None, SKIP_CONSENT=False):
             f"URL: {link}",
             "could not be found on Archive.org. Accessing Google Webcache directly."
         )
-        req = requests.get(
+        req = _timed_get(
+            direct_session(),
             "https://webcache.googleusercontent.com/search?q=cache:" + link,
-            timeout=30
+            "direct"
         )
         # In case of 404, return None
         if not req:
+            metrics.count("webcache_fallbacks", result="missing")
             print("The website hasn't been cached or something else went wrong. Outputting None.")
             return None
-        return BeautifulSoup(req.text, "html.parser")
+        metrics.count("webcache_fallbacks", result="found")
+        return _parse_html(req.text, archive, link, "article", source="webcache")
+
+
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def _url_key(url):
+    """Normalize a URL so that links and Archive.org captures of the same page match"""
+    parts = urlparse(url if "://" in url else "http://" + url)
+    # hostname is lowercase and drops credentials, ports are kept only if they aren't the default
+    host = parts.hostname or ""
+    if host.startswith("www."):
+        host = host[len("www."):]
+    if parts.port is not None and parts.port != _DEFAULT_PORTS.get(parts.scheme):
+        host += f":{parts.port}"
+    return host + parts.path.rstrip("/")
+
+
+def wayback_snapshots(links, tor_request_obj=None, date_from=None, date_to=None):
+    """Resolve Archive.org snapshots of many idnes.cz links at once using the CDX API
+
+    Links are grouped by their section (e.g. `/zpravy/zahranicni/`) and each
+    group is resolved with a single prefix query restricted to the given
+    capture dates and to the requested articles.
+
+    Args:
+        links (list): Article paths as stored in the `link` column (or full URLs)
+        tor_request_obj (requests.sessions.Session, optional): TOR requests object
+        date_from (datetime, optional): Earliest capture date, e.g. the earliest publication date
+        date_to (datetime, optional): Latest capture date
+
+    Returns:
+        snapshots (dict): Mapping of normalized URLs to snapshot URLs of archived pages
+    """
+    requester = tor_request_obj if tor_request_obj is not None else direct_session()
+    via = "direct" if tor_request_obj is None else "tor"
+
+    sections = {}
+    for link in links:
+        path = urlparse(link).path
+        section = "/".join(path.split("/")[:3]) + "/"
+        sections.setdefault(section, []).append(path.rstrip("/").split("/")[-1])
+
+    snapshots = {}
+    for section, pages in sections.items():
+        params = {
+            "url": "idnes.cz" + section,
+            "matchType": "prefix",
+            "output": "json",
+            "fl": "original,timestamp",
+            "filter": ["statuscode:200", "original:.*(" + "|".join(map(re.escape, pages)) + ").*"],
+            "collapse": "urlkey",
+        }
+        if date_from is not None:
+            params["from"] = pd.Timestamp(date_from).strftime("%Y%m%d")
+        if date_to is not None:
+            params["to"] = pd.Timestamp(date_to).strftime("%Y%m%d")
+
+        req = _timed_get(
+            requester,
+            "http://web.archive.org/cdx/search/cdx?" + urlencode(params, doseq=True),
+            via,
+            throttle=False,
+        )
+        req.raise_for_status()
+        rows = req.json() if req.text.strip() else []
+        # The first row is a header
+        for original, timestamp in rows[1:]:
+            snapshots.setdefault(
+                _url_key(original), f"http://web.archive.org/web/{timestamp}/{original}"
+            )
+
+    metrics.count("cdx_lookups", len(sections))
+    return snapshots
+
+
+LIST_COLUMNS = ["link", "date", "time", "title", "perex_short", "premium", "video", "gallery"]
+ARTICLE_COLUMNS = ["perex_full", "word_counter", "authors_hash", "topics"]
+
+
+def article_from_record(record):
+    """Clean a single record of an article list extracted using `IDNES_LIST_SPEC`
+
+    Args:
+        record (dict): Record of an article list
+
+    Returns:
+        (dict): Dictionary with the keys of `LIST_COLUMNS`
+    """
+    article = {}
+    link = record["link"]
+    article["link"] = link.replace("https://www.idnes.cz", "")
+
+    date_and_time = pd.to_datetime(record["datetime"])
+    article["date"] = date_and_time.date()
+    # Articles with no specific time have 00:00:00 as the time of publication
+    if date_and_time.time() == datetime.time(0, 0):
+        article["time"] = pd.NA
+    else:
+        article["time"] = date_and_time.time()
+
+    article["title"] = sentence_cleaner_cz(record["title"])
+
+    # 'perex' is the lead paragraph of each article (shortened here)
+    perex = record["perex"]
+    # Video articles don't have perex in the preview (e.g. around p. 203)
+    if perex is None:
+        article["perex_short"] = pd.NA
+    # The word "Premium" is skipped
+    elif record["premium"]:
+        article["perex_short"] = sentence_cleaner_cz(perex[len("Premium") + 1:])
+    else:
+        article["perex_short"] = sentence_cleaner_cz(perex)
+    article["premium"] = record["premium"]
+    # Some articles are purely video-based
+    article["video"] = record["video"]
+    # Some articles are just photo galleries
+    article["gallery"] = link[-5:] == "/foto"
+
+    return article
+
+
+def article_df_from_records(records):
+    """Generate a dataframe of article properties from records extracted using `IDNES_LIST_SPEC`
+
+    Args:
+        records (list): Output of `Extractor.extract()` for an article list
+
+    Returns:
+        (pandas.core.frame.DataFrame): Dataframe with article properties
+    """
+    return pd.DataFrame([article_from_record(record) for record in records], columns=LIST_COLUMNS)
 
 
 def generate_article_df(soup_object):
@@ -119,76 +361,86 @@ def generate_article_df(soup_object):
     Returns:
         (pandas.core.frame.DataFrame): Dataframe with article properties
     """
-    soup_content = soup_object.find("div", {"id": "list-art-count"})
-    # Initialize empty dictionary
-    article_dict = {
-        "link": [],
-        "date": [],
-        "time": [],
-        "title": [],
-        "perex_short": [],
-        "premium": [],
-        "video": [],
-        "gallery": []
-    }
+    return article_df_from_records(LIST_EXTRACTOR.extract(soup_object))
 
-    # Find and append links, dates, time, titles, perex, and premium access
-    for item in soup_content.findAll("div", {"class": "art"}):
-        link = item.find("a", {"class": "art-link"}, href=True)["href"]
-        article_dict["link"].append(link.replace("https://www.idnes.cz", ""))
 
-        date_and_time = pd.to_datetime(
-            item.find("span", {"class": "time"})["datetime"]
-        )
-        article_dict["date"].append(date_and_time.date())
-        # Articles with no specific time have 00:00:00 as the time of publication
-        if date_and_time.time() == datetime.time(0, 0):
-            article_dict["time"].append(pd.NA)
-        else:
-            article_dict["time"].append(date_and_time.time())
-
-        title = item.find("a", {"class": "art-link"}).find("h3").text
-        title_list = sentence_cleaner_cz(title)
-        article_dict["title"].append(title_list)
-
-        # 'perex' is the lead paragraph of each article (shortened here)
-        perex = item.find("p", {"class": "perex"})
-        # Video articles don't have perex in the preview (e.g. around p. 203)
-        if perex is None:
-            article_dict["perex_short"].append(pd.NA)
-            article_dict["premium"].append(False)
-        # It also gives us the ability to find whether it is a premium article
-        elif perex.find("a", {"class": "premlab"}) is None:
-            perex_list = sentence_cleaner_cz(perex.text)
-            article_dict["perex_short"].append(perex_list)
-            article_dict["premium"].append(False)
-        else:
-            # The word "Premium" is skipped
-            perex_list = sentence_cleaner_cz(perex.text[len("Premium") + 1:])
-            article_dict["perex_short"].append(perex_list)
-            article_dict["premium"].append(True)
-        # Some articles are purely video-based
-        video = item.find("a", {"score-type": "Video"})
-        if video is not None:
-            article_dict["video"].append(True)
-        else:
-            article_dict["video"].append(False)
-        # Some articles are just photo galleries
-        if link[-5:] == "/foto":
-            article_dict["gallery"].append(True)
-        else:
-            article_dict["gallery"].append(False)
+def article_from_fields(fields):
+    """Clean the fields of an article page extracted using `IDNES_ARTICLE_SPEC`
+
+    Args:
+        fields (dict): Output of `Extractor.extract()` for an article page
+
+    Returns:
+        (dict): Dictionary with the keys `perex_full`, `word_counter`, `authors_hash`, and `topics`
+    """
+    article = {}
+
+    # Full perex, NA if neither of the opening paragraphs exists
+    if fields["perex_full"] is None:
+        article["perex_full"] = pd.NA
+    else:
+        article["perex_full"] = sentence_cleaner_cz(fields["perex_full"])
+
+    # Content of the article as a Counter object
+    if fields["content"] is None:
+        article["word_counter"] = pd.NA
+    else:
+        content_list = [sentence_cleaner_cz(paragraph) for paragraph in fields["content"]]
+        # Unnest nested lists -> convert iterable to list -> apply Counter (50 most common words)
+        article["word_counter"] = Counter(
+            list(chain.from_iterable(content_list))
+        ).most_common(50)
+
+    # Some articles have no authors
+    if fields["authors"] is None:
+        article["authors_hash"] = pd.NA
+    else:
+        # For our intents and purposes, we won't store names of the authors
+        # Instead, we store keyed hashes - stable unique ID for each author
+        article["authors_hash"] = [author_id(x) for x in fields["authors"].split(", ")]
+
+    # Topics or tags of each article (lowercase), in some cases, there are no tags
+    if fields["topics"] is None:
+        article["topics"] = pd.NA
+    else:
+        article["topics"] = [tag.strip().lower() for tag in fields["topics"]]
+
+    return article
 
-    return pd.DataFrame(article_dict)
 
+def parse_article(soup_page):
+    """Extract the full perex, content, authors, and topics of an article page
 
-def add_content(article_df, tor_requests_obj, sleeping=(10, 15)):
+    Args:
+        soup_page (bs4.BeautifulSoup): Parsed article page
+
+    Returns:
+        (dict): Dictionary with the keys `perex_full`, `word_counter`, `authors_hash`, and `topics`
+    """
+    return article_from_fields(ARTICLE_EXTRACTOR.extract(soup_page))
+
+
+@profiling.stage("add_content")
+def add_content(
+    article_df,
+    tor_requests_obj,
+    sleeping=(10, 15),
+    word_sketch=None,
+    archive=None,
+    prefetch_snapshots=True
+):
     """Add content to the article dataframe generated by `generate_article_df`
 
     Args:
         article_df (pandas.core.frame.DataFrame): Dataframe with article properties
         tor_requests_obj (requests.sessions.Session): TOR requests object
         sleeping (tuple, optional): Sleep time inbetween requests, defaults to (10, 15)
+        word_sketch (tmc_utils.word_sketch.SpaceSaving, optional): Sketch updated with the
+            words of each processed article
+        archive (tmc_utils.html_archive.HtmlArchive, optional): Archive to store the fetched
+            article pages in
+        prefetch_snapshots (bool, optional): Resolve the Archive.org snapshots of all articles
+            using `wayback_snapshots()` before fetching them, defaults to True
 
     Returns:
         (pandas.core.frame.DataFrame): Dataframe with article properties and other content
@@ -201,93 +453,65 @@ def add_content(article_df, tor_requests_obj, sleeping=(10, 15)):
         "topics": []
     }
 
+    snapshots = None
+    if prefetch_snapshots:
+        to_fetch = ~(article_df.premium | article_df.gallery | article_df.video)
+        try:
+            snapshots = wayback_snapshots(
+                article_df.link[to_fetch],
+                tor_requests_obj,
+                date_from=pd.to_datetime(article_df.date).min()
+            )
+            print(f"Found {len(snapshots)} snapshots on Archive.org for the current list.")
+        # Fall back to asking Archive.org for each article separately
+        except (requests.exceptions.RequestException, ValueError) as error:
+            print("Bulk lookup of Archive.org snapshots failed:", error)
+
+    start = perf_counter()
+    fetched = 0
+
     for j, path in enumerate(article_df.link):
-        # Provide simple progress bar
+        # Provide simple progress bar, the ETA is based on the pages fetched so far
+        if fetched > 0:
+            per_page = (perf_counter() - start) / fetched
+        else:
+            per_page = sleeping[1]
         print(
             f"Processing page {j + 1} / {len(article_df.link)}.",
-            f"Estimated time left for the current list: {sleeping[1] * (len(article_df.link) - j)}s"
+            f"Estimated time left for the current list: {round(per_page * (len(article_df.link) - j))}s"
         )
 
         if article_df.premium[j] or article_df.gallery[j] or article_df.video[j]:
-            in_article_dict["perex_full"].append(pd.NA)
-            in_article_dict["word_counter"].append(pd.NA)
-            in_article_dict["authors_hash"].append(pd.NA)
-            in_article_dict["topics"].append(pd.NA)
+            for key in in_article_dict:
+                in_article_dict[key].append(pd.NA)
+            metrics.count("articles_processed", result="skipped")
             print("Premium, gallery, or video article detected. Skipping.")
             continue
 
         # Request and parse
-        soup_page = soup_object_request_all("https://www.idnes.cz" + path, tor_requests_obj)
-        # Give the page some breathing room
-        sleep(round(uniform(sleeping[0], sleeping[1]), 3))
+        soup_page = soup_object_request_all(
+            "https://www.idnes.cz" + path, tor_requests_obj, archive=archive, snapshots=snapshots
+        )
+        # Give the page some breathing room, longer if we are being rate limited
+        THROTTLE.wait(sleeping)
+        fetched += 1
 
         # Save only cached websites in this step (a lot of requests), do not access directly
         if soup_page is None:
             print("Tried Archive.org and Google Webcache, found nothing. Skipping.")
-            in_article_dict["perex_full"].append(pd.NA)
-            in_article_dict["word_counter"].append(pd.NA)
-            in_article_dict["authors_hash"].append(pd.NA)
-            in_article_dict["topics"].append(pd.NA)
+            for key in in_article_dict:
+                in_article_dict[key].append(pd.NA)
+            metrics.count("articles_processed", result="missing")
             continue
 
-        # Full perex
-        try:
-            perex_full = sentence_cleaner_cz(
-                soup_page.find("div", {"class": "opener"}).text
-            )
-            in_article_dict["perex_full"].append(perex_full)
-        # Some subpages have a different name for the opening paragraph
-        except AttributeError:
-            # In case an Attribute error persists, produce NA
-            try:
-                perex_full = sentence_cleaner_cz(
-                    soup_page.find("div", {"class": "excert"}).text
-                )
-                in_article_dict["perex_full"].append(perex_full)
-            except AttributeError:
-                in_article_dict["perex_full"].append(pd.NA)
-
-        # Content of the article as a Counter object
-        content_list = []
-        div_art_text = soup_page.find("div", {"id": "art-text"})
-        # Some subpages use a different attribute for content
-        if div_art_text is None:
-            div_art_text = soup_page.find("div", {"class": "content"})
-        try:
-            for item in div_art_text.findAll("p", attrs={"class": None}):
-                content_list.append(sentence_cleaner_cz(item.text))
-
-            # Unnest nested lists -> convert iterable to list -> apply Counter (50 most common words)
-            in_article_dict["word_counter"].append(
-                Counter(list(chain.from_iterable(content_list))).most_common(50)
-            )
-        except AttributeError:
-            in_article_dict["word_counter"].append(pd.NA)
-
-        try:
-            # Hashed author names
-            authors_div = soup_page.find("div", {"class": "authors"}).find(
-                "span", {"itemprop": "name"}
-            )
-            # For our intents and purposes, we won't store names of the authors
-            # Instead, we store hashes - unique ID for each author
-            in_article_dict["authors_hash"].append(
-                [hash(x) for x in authors_div.text.split(", ")]
-            )
-        # Some articles have no authors
-        except AttributeError:
-            in_article_dict["authors_hash"].append(pd.NA)
-
-        # Topics or tags of each article (lowercase)
-        tags = []
-        try:
-            topics_div = soup_page.find("div", {"id": "art-tags"}).findAll("a")
-            for tag in topics_div:
-                tags.append(tag.text.strip().lower())
-            in_article_dict["topics"].append(tags)
-        # In some cases, there are no tags
-        except AttributeError:
-            in_article_dict["topics"].append(pd.NA)
+        with metrics.timed("extract_seconds"):
+            article = parse_article(soup_page)
+        for key in in_article_dict:
+            in_article_dict[key].append(article[key])
+        if word_sketch is not None and isinstance(article["word_counter"], list):
+            word_sketch.update_counter(dict(article["word_counter"]))
+        metrics.count("articles_processed", result="ok")
+        metrics.gauge("articles_per_minute", 60 * fetched / (perf_counter() - start))
 
     return pd.concat(
         [article_df, pd.DataFrame(in_article_dict)],
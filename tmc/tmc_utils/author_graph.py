@@ -0,0 +1,128 @@
+"""Author / section edge counts.
+
+Maintains a long table of how many articles each author published in each
+section on a given day. The counts are aggregated from the author bridge
+(`tmc_utils.author_ids`, a row per article and author) and kept up to date
+incrementally as new articles are added, so that author analytics (e.g.
+`sankey_diagram()`) only sum pre-aggregated counts instead of exploding the
+whole corpus on every call. Articles that are already in the bridge (e.g.
+after re-scraping a list, or scraping overlapping lists) have their previous
+counts subtracted first, so they aren't counted twice.
+
+The module contains the following functions:
+
+- `author_section_counts(bridge)` - Aggregate an author bridge into an edge table
+- `update_author_section_counts(edges, bridge, df)` - Add or replace articles of an edge table
+- `top_author_sections(edges, top_n=25, start=None, end=None)` - Top author-section pairs
+- `load_author_section_counts(path)` - Read a persisted edge table
+- `save_author_section_counts(edges, path)` - Persist an edge table
+"""
+
+from os.path import isfile
+import pandas as pd
+from tmc_utils.author_ids import author_bridge
+
+EDGE_COLUMNS = ["author_id", "section", "date", "count"]
+_KEYS = ["author_id", "section", "date"]
+
+
+def author_section_counts(bridge):
+    """Count the articles per author, section, and day of an author bridge
+
+    Args:
+        bridge (pandas.core.frame.DataFrame): Output of `author_ids.author_bridge()`
+
+    Returns:
+        edges (pandas.core.frame.DataFrame): Long dataframe of authors / sections / dates / counts
+    """
+    if len(bridge) == 0:
+        return pd.DataFrame(columns=EDGE_COLUMNS)
+
+    sections = bridge.link.str.split("/", n=2).str[1]
+    return (
+        bridge.assign(section=sections)
+        .groupby(_KEYS)
+        .size()
+        .reset_index(name="count")
+    )
+
+
+def update_author_section_counts(edges, bridge, df):
+    """Add the articles of `df` to an existing edge table
+
+    Call it before adding the articles to the author bridge: the counts of
+    articles of `df` that are already in `bridge` are subtracted, so
+    updating the table with the same articles again doesn't change it.
+
+    Args:
+        edges (pandas.core.frame.DataFrame): Output of `author_section_counts()`
+        bridge (pandas.core.frame.DataFrame): Author bridge of the articles counted in `edges`
+        df (pandas.core.frame.DataFrame): Dataframe of new articles
+
+    Returns:
+        (pandas.core.frame.DataFrame): Updated edge table
+    """
+    added = author_section_counts(author_bridge(df))
+    removed = author_section_counts(bridge[bridge.link.isin(df.link)])
+    removed["count"] = -removed["count"]
+
+    parts = [part for part in (edges, added, removed) if len(part) > 0]
+    if len(parts) == 0:
+        return pd.DataFrame(columns=EDGE_COLUMNS)
+    combined = pd.concat(parts, axis=0).groupby(_KEYS, as_index=False)["count"].sum()
+    return combined[combined["count"] > 0].reset_index(drop=True)
+
+
+def top_author_sections(edges, top_n=25, start=None, end=None):
+    """Return the top author-section pairs by article count
+
+    Args:
+        edges (pandas.core.frame.DataFrame): Output of `author_section_counts()`
+        top_n (int, optional): Number of pairs to return, defaults to 25
+        start (str or datetime, optional): First day of the time window (inclusive)
+        end (str or datetime, optional): Last day of the time window (inclusive)
+
+    Returns:
+        (pandas.core.frame.DataFrame): Dataframe of authors / sections / counts
+    """
+    if start is not None:
+        edges = edges[edges.date >= pd.to_datetime(start)]
+    if end is not None:
+        edges = edges[edges.date <= pd.to_datetime(end)]
+
+    return (
+        edges.groupby(["author_id", "section"], as_index=False)["count"]
+        .sum()
+        .nlargest(top_n, "count")
+        .reset_index(drop=True)
+    )
+
+
+def load_author_section_counts(path):
+    """Read an edge table saved by `save_author_section_counts()`
+
+    Args:
+        path (str): Path to the .csv file
+
+    Raises:
+        ValueError: If the file isn't an edge table
+
+    Returns:
+        (pandas.core.frame.DataFrame): Edge table, empty if the file doesn't exist
+    """
+    if not isfile(path):
+        return pd.DataFrame(columns=EDGE_COLUMNS)
+
+    if list(pd.read_csv(path, nrows=0).columns) != EDGE_COLUMNS:
+        raise ValueError(f"{path} isn't an edge table, its columns should be {EDGE_COLUMNS}.")
+    return pd.read_csv(path, dtype={"author_id": "uint32"}, parse_dates=["date"])
+
+
+def save_author_section_counts(edges, path):
+    """Save an edge table as a .csv file
+
+    Args:
+        edges (pandas.core.frame.DataFrame): Output of `author_section_counts()`
+        path (str): Path to the .csv file
+    """
+    edges.to_csv(path, index=False)
@@ -0,0 +1,216 @@
+"""Stable author identifiers and the author dimension table.
+
+Names of the authors are never stored. Instead, each name is hashed with
+BLAKE2b keyed by a secret (the `TMC_AUTHOR_KEY` environment variable, see
+`ensure_author_key()`) into a 32-bit unsigned integer. Unlike the built-in
+`hash()`, which is salted per process, the same author gets the same id in
+every run (as long as the key doesn't change), so ids can be joined across
+scraping runs. The key prevents
+anyone without it from recovering the names by hashing a list of known
+authors.
+
+The `authors_hash` column of the article dataframes holds lists of these ids.
+The author bridge links articles to authors with a row per article and author,
+and the author dimension table keeps one row per author with the number of
+articles and the dates of the first and the last one, so author analytics are
+joins on integer columns. The bridge is keyed by the article link: updating it
+with articles it already contains replaces their rows, and the dimension table
+is computed from the bridge, so neither counts an article twice.
+
+The module contains the following functions:
+
+- `ensure_author_key(path)` - Sets the author key, generating and persisting it if needed
+- `author_id(name)` - Returns the stable id of an author
+- `author_bridge(df)` - Long table of article links, author ids, and dates
+- `update_author_bridge(bridge, df)` - Adds or replaces articles of an author bridge
+- `author_dimension(df)` - Builds the author dimension table of articles
+- `author_dimension_from_bridge(bridge)` - Builds the author dimension table of a bridge
+- `load_author_bridge(path)` - Reads a persisted author bridge
+- `save_author_bridge(bridge, path)` - Persists an author bridge
+- `save_author_dimension(authors, path)` - Persists an author dimension table
+"""
+
+import os
+import unicodedata
+from functools import lru_cache
+from hashlib import blake2b
+from os.path import isfile
+from secrets import token_hex
+import pandas as pd
+
+AUTHOR_KEY_ENV = "TMC_AUTHOR_KEY"
+# 32-bit ids, the chance of any collision among 2,000 authors is about 0.05 %
+AUTHOR_ID_BYTES = 4
+BRIDGE_COLUMNS = ["link", "author_id", "date"]
+DIMENSION_COLUMNS = ["author_id", "articles", "first_seen", "last_seen"]
+
+
+@lru_cache(maxsize=None)
+def _author_key():
+    key = os.environ.get(AUTHOR_KEY_ENV, "")
+    # Without a key, anyone could reverse the ids by hashing known names
+    if len(key) == 0:
+        raise RuntimeError(
+            f"{AUTHOR_KEY_ENV} isn't set. Set it to a secret string or call ensure_author_key()."
+        )
+    # BLAKE2b keys are at most 64 bytes long
+    return blake2b(key.encode("utf-8")).digest() if len(key) > 64 else key.encode("utf-8")
+
+
+def ensure_author_key(path):
+    """Set the author key from a file, generating a random one on the first run
+
+    A key already set in the `TMC_AUTHOR_KEY` environment variable takes
+    precedence. Otherwise the key is read from `path`, or generated and saved
+    there (readable by the current user only), so that ids match across runs.
+    The environment variable is set as well, so worker processes use the same key.
+
+    Args:
+        path (str): Path to the key file, e.g. "data/author_key"
+    """
+    if len(os.environ.get(AUTHOR_KEY_ENV, "")) > 0:
+        return
+    if isfile(path):
+        with open(path, encoding="utf-8") as file:
+            key = file.read().strip()
+    else:
+        key = token_hex(32)
+        with os.fdopen(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600), "w") as file:
+            file.write(key + "\n")
+        print(f"Generated a new author key in {path}. Keep it to get the same author ids.")
+    if len(key) == 0:
+        raise RuntimeError(f"The author key file {path} is empty.")
+    os.environ[AUTHOR_KEY_ENV] = key
+    _author_key.cache_clear()
+
+
+def author_id(name):
+    """Return the stable id of an author
+
+    Names are normalized (Unicode NFC, case, and whitespace) before hashing.
+
+    Args:
+        name (str): Name of the author
+
+    Returns:
+        (int): Non-negative integer lower than 2**32
+    """
+    normalized = " ".join(unicodedata.normalize("NFC", name).casefold().split())
+    digest = blake2b(
+        normalized.encode("utf-8"), digest_size=AUTHOR_ID_BYTES, key=_author_key()
+    ).digest()
+    return int.from_bytes(digest, "big")
+
+
+def author_bridge(df):
+    """Return a long table linking articles to their authors
+
+    Args:
+        df (pandas.core.frame.DataFrame): Dataframe of articles
+
+    Returns:
+        (pandas.core.frame.DataFrame): Dataframe with the columns `link`, `author_id`, and
+            `date` (the day of the article)
+    """
+    bridge = (
+        df[["link", "authors_hash", "date"]]
+        .explode("authors_hash")
+        .dropna(subset=["authors_hash"])
+        .rename(columns={"authors_hash": "author_id"})
+        .drop_duplicates(["link", "author_id"])
+        .reset_index(drop=True)
+    )
+    bridge["author_id"] = bridge.author_id.astype("uint32")
+    bridge["date"] = pd.to_datetime(bridge.date).dt.normalize()
+    return bridge[BRIDGE_COLUMNS]
+
+
+def update_author_bridge(bridge, df):
+    """Add the articles of `df` to an existing author bridge
+
+    Rows of articles that are already in the bridge are replaced, so updating
+    the bridge with the same articles again doesn't change it.
+
+    Args:
+        bridge (pandas.core.frame.DataFrame): Output of `author_bridge()`
+        df (pandas.core.frame.DataFrame): Dataframe of new articles
+
+    Returns:
+        (pandas.core.frame.DataFrame): Updated author bridge
+    """
+    new_bridge = author_bridge(df)
+    if bridge is None or len(bridge) == 0:
+        return new_bridge
+
+    kept = bridge[~bridge.link.isin(df.link)]
+    return pd.concat([kept, new_bridge], axis=0, ignore_index=True)
+
+
+def author_dimension_from_bridge(bridge):
+    """Build a table with the number of articles and the first and last article date per author
+
+    Args:
+        bridge (pandas.core.frame.DataFrame): Output of `author_bridge()`
+
+    Returns:
+        (pandas.core.frame.DataFrame): Author dimension table
+    """
+    if len(bridge) == 0:
+        return pd.DataFrame(columns=DIMENSION_COLUMNS)
+
+    return (
+        bridge.groupby("author_id")
+        .agg(
+            articles=("link", "nunique"),
+            first_seen=("date", "min"),
+            last_seen=("date", "max"),
+        )
+        .reset_index()
+    )
+
+
+def author_dimension(df):
+    """Build the author dimension table of a dataframe of articles
+
+    Args:
+        df (pandas.core.frame.DataFrame): Dataframe of articles
+
+    Returns:
+        (pandas.core.frame.DataFrame): Author dimension table
+    """
+    return author_dimension_from_bridge(author_bridge(df))
+
+
+def load_author_bridge(path):
+    """Read an author bridge saved by `save_author_bridge()`
+
+    Args:
+        path (str): Path to the .csv file
+
+    Returns:
+        (pandas.core.frame.DataFrame): Author bridge, empty if the file doesn't exist
+    """
+    if not isfile(path):
+        return pd.DataFrame(columns=BRIDGE_COLUMNS)
+
+    return pd.read_csv(path, dtype={"author_id": "uint32"}, parse_dates=["date"])
+
+
+def save_author_bridge(bridge, path):
+    """Save an author bridge as a .csv file
+
+    Args:
+        bridge (pandas.core.frame.DataFrame): Output of `author_bridge()`
+        path (str): Path to the .csv file
+    """
+    bridge.to_csv(path, index=False)
+
+
+def save_author_dimension(authors, path):
+    """Save an author dimension table as a .csv file
+
+    Args:
+        authors (pandas.core.frame.DataFrame): Output of `author_dimension_from_bridge()`
+        path (str): Path to the .csv file
+    """
+    authors.to_csv(path, index=False)
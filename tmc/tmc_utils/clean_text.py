@@ -17,12 +17,25 @@ The module contains the following functions:
 
 import re
 import string
+from functools import lru_cache
 import nltk
 import simplemma as sl
 from sumy.nlp.stemmers import czech
 from stop_words import get_stop_words
+from tmc_utils import metrics, profiling
 
 
+@lru_cache(maxsize=None)
+def _ensure_punkt():
+    """Download the NLTK tokenizer once and only if it isn't installed yet"""
+    try:
+        nltk.data.find("tokenizers/punkt")
+    except LookupError:
+        nltk.download("punkt", quiet=True)
+
+
+@metrics.timed("clean_seconds")
+@profiling.stage("sentence_cleaner_cz")
 def sentence_cleaner_cz(text_string: str):
     """Pre-process Czech sentences for text mining
 
@@ -33,7 +46,7 @@ def sentence_cleaner_cz(text_string: str):
         token_words_lm (list): List of lowercase words (no numbers, punctuation, or symbols)
     """
     # Download tokenizer and define stopwords
-    nltk.download("punkt", quiet=True)
+    _ensure_punkt()
     stop_words = get_stop_words("czech")
     punct_and_symbols = string.punctuation + "„“"
 
@@ -0,0 +1,244 @@
+"""Declarative extraction of records from HTML pages.
+
+The structure of a page is described by a spec, a JSON-serializable
+dictionary mapping field names to CSS selectors with ordered fallbacks. Specs
+are compiled once into soupsieve selectors, so extracting a page is a handful
+of tree queries instead of hand-written `find()` chains, and supporting
+another layout (or another news site) only means writing another spec.
+
+A spec has the following keys:
+
+- `items` (str, optional) - Selector of repeated records, e.g. the articles of
+  a list page. Without it, the whole page is a single record.
+- `fields` (dict) - Field names mapped to field specs:
+    - `select` (str or list) - Selector or ordered fallback selectors, the
+      first one matching anything wins
+    - `within` (str, optional) - Selector of descendants of the first match,
+      the value is then a list of all of them (empty if there are none)
+    - `all` (bool, optional) - Return a list of all matches instead of the first
+    - `attr` (str, optional) - Return an attribute instead of the text
+    - `exists` (bool, optional) - Return whether anything matches
+
+Missing values are None. For example:
+
+    {"items": "div.art", "fields": {
+        "link": {"select": "a.art-link[href]", "attr": "href"},
+        "perex": {"select": ["div.opener", "div.excert"]},
+        "premium": {"select": "a.premlab", "exists": True}}}
+
+The module contains the following:
+
+- `Extractor(spec)` - Compiled spec extracting records from parsed pages
+- `load_spec(path)` - Loads a spec from a .json file
+- `ExtractorPool(specs, processes=None, load=None, postprocess=None, parser="html.parser")` -
+  Process pool extracting pages with several specs
+- `extract_batch(spec, pages, processes=None, load=None, postprocess=None, parser="html.parser",
+  chunksize=16)` - Extracts many pages in a process pool
+"""
+
+import json
+from itertools import repeat
+from concurrent.futures import ProcessPoolExecutor
+import soupsieve
+from bs4 import BeautifulSoup
+
+
+class Extractor:
+    """Spec compiled into CSS selectors
+
+    Args:
+        spec (dict): Extraction spec, see the module docstring
+
+    Raises:
+        ValueError: If a field has no selector
+    """
+
+    def __init__(self, spec):
+        self.spec = spec
+        self._items = soupsieve.compile(spec["items"]) if spec.get("items") else None
+        self._fields = {}
+        for name, field in spec["fields"].items():
+            selectors = field.get("select")
+            if not selectors:
+                raise ValueError(f"Field '{name}' has no selector.")
+            if isinstance(selectors, str):
+                selectors = [selectors]
+            self._fields[name] = (
+                [soupsieve.compile(selector) for selector in selectors],
+                soupsieve.compile(field["within"]) if field.get("within") else None,
+                field,
+            )
+
+    @staticmethod
+    def _value(tag, field):
+        if field.get("attr"):
+            return tag.get(field["attr"])
+        return tag.text
+
+    def _extract_field(self, tag, selectors, within, field):
+        if field.get("all"):
+            for selector in selectors:
+                matches = selector.select(tag)
+                if matches:
+                    return [self._value(match, field) for match in matches]
+            return None
+
+        for selector in selectors:
+            match = selector.select_one(tag)
+            if match is None:
+                continue
+            if field.get("exists"):
+                return True
+            if within is not None:
+                return [self._value(child, field) for child in within.select(match)]
+            return self._value(match, field)
+
+        return False if field.get("exists") else None
+
+    def extract_record(self, tag):
+        """Extract the fields of a single record
+
+        Args:
+            tag (bs4.element.Tag): Element containing the record
+
+        Returns:
+            (dict): Field names mapped to their values
+        """
+        return {
+            name: self._extract_field(tag, selectors, within, field)
+            for name, (selectors, within, field) in self._fields.items()
+        }
+
+    def extract(self, soup):
+        """Extract a parsed page
+
+        Args:
+            soup (bs4.BeautifulSoup): Parsed HTML document using BeautifulSoup
+
+        Returns:
+            (list or dict): List of records if the spec has `items`, a single record otherwise
+        """
+        if self._items is None:
+            return self.extract_record(soup)
+        return [self.extract_record(item) for item in self._items.select(soup)]
+
+    def extract_html(self, html, parser="html.parser"):
+        """Parse an HTML document and extract it, see `extract()`"""
+        return self.extract(BeautifulSoup(html, parser))
+
+
+def load_spec(path):
+    """Load an extraction spec from a .json file
+
+    Args:
+        path (str): Path to the spec
+
+    Returns:
+        (dict): Extraction spec
+    """
+    with open(path, encoding="utf-8") as file:
+        return json.load(file)
+
+
+# Each worker process compiles the specs once
+_WORKER = {}
+
+
+def _init_worker(specs, load, postprocess, parser):
+    _WORKER.update(
+        extractors={name: Extractor(spec) for name, spec in specs.items()},
+        load=load,
+        postprocess=postprocess,
+        parser=parser,
+    )
+
+
+def _extract_page(task):
+    name, page = task
+    html = page if _WORKER["load"] is None else _WORKER["load"](page)
+    result = _WORKER["extractors"][name].extract_html(html, _WORKER["parser"])
+    if _WORKER["postprocess"].get(name) is not None:
+        result = _WORKER["postprocess"][name](result)
+    return result
+
+
+class ExtractorPool:
+    """Pool of processes extracting pages with several specs
+
+    The worker processes are started once and compile all specs once, so
+    extracting several kinds of pages (e.g. article lists and articles) doesn't
+    pay for starting a pool per kind. Use as a context manager or call `close()`.
+
+    `load` and `postprocess` are run in the worker processes, so they have to
+    be picklable (e.g. module-level functions). Passing references to pages
+    with a `load` function avoids sending whole documents to the workers.
+
+    Args:
+        specs (dict): Names mapped to extraction specs, see the module docstring
+        processes (int, optional): Number of worker processes, defaults to the number of CPUs
+        load (callable, optional): Function returning the HTML document of a page
+        postprocess (dict, optional): Names of specs mapped to functions applied to the output
+            of `Extractor.extract()`, e.g. to clean the extracted text
+        parser (str, optional): BeautifulSoup parser, defaults to "html.parser" ("lxml" is faster)
+    """
+
+    def __init__(self, specs, processes=None, load=None, postprocess=None, parser="html.parser"):
+        self._pool = ProcessPoolExecutor(
+            processes,
+            initializer=_init_worker,
+            initargs=(specs, load, postprocess or {}, parser),
+        )
+
+    def map(self, name, pages, chunksize=16):
+        """Extract many pages with one of the specs
+
+        Args:
+            name: Name of the spec in `specs`
+            pages (iterable): HTML documents, or anything `load` turns into one
+            chunksize (int, optional): Number of pages sent to a worker at once, defaults to 16
+
+        Returns:
+            (list): Extracted (and post-processed) pages in the order of `pages`
+        """
+        return list(self._pool.map(_extract_page, zip(repeat(name), pages), chunksize=chunksize))
+
+    def close(self):
+        """Shut the worker processes down"""
+        self._pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def extract_batch(
+    spec,
+    pages,
+    processes=None,
+    load=None,
+    postprocess=None,
+    parser="html.parser",
+    chunksize=16
+):
+    """Extract many pages in parallel using a pool of processes
+
+    Starts a pool for this batch only, see `ExtractorPool` for extracting
+    several batches with the same worker processes.
+
+    Args:
+        spec (dict): Extraction spec, see the module docstring
+        pages (iterable): HTML documents, or anything `load` turns into one
+        processes (int, optional): Number of worker processes, defaults to the number of CPUs
+        load (callable, optional): Function returning the HTML document of a page
+        postprocess (callable, optional): Function applied to the output of `Extractor.extract()`,
+            e.g. to clean the extracted text
+        parser (str, optional): BeautifulSoup parser, defaults to "html.parser" ("lxml" is faster)
+        chunksize (int, optional): Number of pages sent to a worker at once, defaults to 16
+
+    Returns:
+        (list): Extracted (and post-processed) pages in the order of `pages`
+    """
+    with ExtractorPool({"spec": spec}, processes, load, {"spec": postprocess}, parser) as pool:
+        return pool.map("spec", pages, chunksize)
@@ -0,0 +1,111 @@
+"""Append-only archive of fetched HTML pages.
+
+Stores every fetched article list and article page so that parsing and
+cleaning can be re-run offline (see `reprocess.py`) instead of re-scraping.
+Similarly to WARC files, each page is stored as a separate gzip member
+appended to a single file, so the file as a whole is a valid .gz file and any
+record can be decompressed on its own. A JSON lines index next to the archive
+(`<path>.idx`) records the URL, kind, fetch time, additional metadata, and the
+byte offset and length of each record for random access.
+
+The module contains the following:
+
+- `HtmlArchive(path)` - Append-only, randomly accessible archive of HTML pages
+- `read_record(path, offset, length)` - Reads a single record of an archive
+"""
+
+import gzip
+import json
+import os
+import threading
+from datetime import datetime, timezone
+
+
+class HtmlArchive:
+    """Compressed, append-only archive of HTML pages with an offset index
+
+    Args:
+        path (str): Path to the archive file, the index is stored as `<path>.idx`
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.index_path = path + ".idx"
+        self._lock = threading.Lock()
+        self._entries = []
+        if os.path.isfile(self.index_path):
+            with open(self.index_path, encoding="utf-8") as file:
+                self._entries = [json.loads(line) for line in file if line.strip()]
+
+    def append(self, url, html, kind, **meta):
+        """Store a page
+
+        Args:
+            url (str): URL of the original page (not of the mirror it was fetched from)
+            html (str): HTML document
+            kind (str): Kind of the page, e.g. "list" or "article"
+            **meta: Additional JSON-serializable metadata, e.g. `list_number=289`
+
+        Returns:
+            (dict): Index entry of the stored record
+        """
+        record = gzip.compress(html.encode("utf-8"))
+        with self._lock:
+            with open(self.path, "ab") as file:
+                offset = file.tell()
+                file.write(record)
+            entry = {
+                "url": url,
+                "kind": kind,
+                "fetched": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "offset": offset,
+                "length": len(record),
+                **meta,
+            }
+            with open(self.index_path, "a", encoding="utf-8") as file:
+                file.write(json.dumps(entry) + "\n")
+            self._entries.append(entry)
+        return entry
+
+    def entries(self, kind=None):
+        """Return the index entries, optionally only of a given kind
+
+        Args:
+            kind (str, optional): Kind of the page, e.g. "list" or "article"
+
+        Returns:
+            (list): List of index entries in the order they were stored
+        """
+        if kind is None:
+            return list(self._entries)
+        return [entry for entry in self._entries if entry["kind"] == kind]
+
+    def read(self, entry):
+        """Return the HTML document of an index entry"""
+        return read_record(self.path, entry["offset"], entry["length"])
+
+    def get(self, url):
+        """Return the most recently stored HTML document of `url` or None"""
+        for entry in reversed(self._entries):
+            if entry["url"] == url:
+                return self.read(entry)
+        return None
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def read_record(path, offset, length):
+    """Read and decompress a single record of an archive
+
+    Args:
+        path (str): Path to the archive file
+        offset (int): Byte offset of the record
+        length (int): Compressed length of the record in bytes
+
+    Returns:
+        (str): HTML document
+    """
+    with open(path, "rb") as file:
+        file.seek(offset)
+        return gzip.decompress(file.read(length)).decode("utf-8")
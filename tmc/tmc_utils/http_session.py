@@ -0,0 +1,170 @@
+"""Pooled HTTP sessions with retries and adaptive backoff.
+
+Opening a new TCP/TLS connection for every request is slow, especially over
+Tor. The sessions created here keep connections alive in per-host pools and
+retry rate-limited (429) and server-error (5xx) responses, honoring the
+`Retry-After` header. On top of that, `THROTTLE` adapts the time slept between
+requests: it slows down whenever rate limiting is detected and gradually
+speeds back up once the responses are fine again. A rate-limited final
+response makes the next sleep last at least as long as its `Retry-After`.
+
+The module contains the following:
+
+- `get_session(proxies=None, retries=3, backoff_factor=2, pool_maxsize=10,
+  retry_statuses=RETRY_STATUSES)` - Creates a pooled session with retries
+- `direct_session()` - Returns the session of the current thread for requests outside of Tor
+- `AdaptiveThrottle(factor=2, decay=0.8, max_multiplier=16)` - Adaptive sleep between requests
+- `THROTTLE` - The throttle shared by the scraping functions
+"""
+
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import threading
+from random import uniform
+from time import sleep
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from tmc_utils import metrics
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+RATE_LIMIT_STATUSES = (429, 503)
+
+# Sessions aren't guaranteed to be thread safe, each thread gets its own
+_DIRECT_SESSIONS = threading.local()
+
+
+def get_session(
+    proxies=None, retries=3, backoff_factor=2, pool_maxsize=10, retry_statuses=RETRY_STATUSES
+):
+    """Create a session with keep-alive connection pools and retries
+
+    Args:
+        proxies (dict, optional): Proxies of the session, e.g. the TOR SOCKS proxy
+        retries (int, optional): Maximum number of retries per request, defaults to 3
+        backoff_factor (float, optional): Exponential backoff factor in seconds between retries
+            without a `Retry-After` header, defaults to 2
+        pool_maxsize (int, optional): Maximum number of kept-alive connections per host,
+            defaults to 10
+        retry_statuses (tuple, optional): Response statuses that are retried, defaults to
+            `RETRY_STATUSES`, connection errors are retried regardless
+
+    Returns:
+        (requests.sessions.Session): A session object
+    """
+    retry = Retry(
+        total=retries,
+        status_forcelist=retry_statuses,
+        backoff_factor=backoff_factor,
+        # urllib3 retries 429 and 503 responses with a Retry-After header even if not listed
+        respect_retry_after_header=len(retry_statuses) > 0,
+        allowed_methods=frozenset(["GET", "HEAD"]),
+        # Return the last response instead of raising once the retries are used up
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_maxsize=pool_maxsize, max_retries=retry)
+
+    session = requests.session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    if proxies is not None:
+        session.proxies = proxies
+    return session
+
+
+def direct_session():
+    """Return the session of the current thread for requests that aren't routed through TOR"""
+    session = getattr(_DIRECT_SESSIONS, "session", None)
+    if session is None:
+        session = _DIRECT_SESSIONS.session = get_session()
+    return session
+
+
+def _retry_after_seconds(value):
+    """Parse a `Retry-After` header, either a number of seconds or an HTTP date"""
+    value = (value or "").strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        until = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return 0.0
+    if until.tzinfo is None:
+        until = until.replace(tzinfo=timezone.utc)
+    return max((until - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+class AdaptiveThrottle:
+    """Sleep between requests, longer when rate limited
+
+    The sleep time is drawn from the range supplied to `wait()` and multiplied
+    by a factor that grows on every rate-limited response and decays back to 1
+    on every successful one. The throttle may be shared by several threads.
+
+    Args:
+        factor (float, optional): Multiplier growth on rate limiting, defaults to 2
+        decay (float, optional): Multiplier decay on success, defaults to 0.8
+        max_multiplier (float, optional): Upper bound of the multiplier, defaults to 16
+    """
+
+    def __init__(self, factor=2, decay=0.8, max_multiplier=16):
+        self.factor = factor
+        self.decay = decay
+        self.max_multiplier = max_multiplier
+        self.multiplier = 1.0
+        self.retry_after = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, response):
+        """Adjust the multiplier according to a response
+
+        Args:
+            response (requests.models.Response): Response to a request
+        """
+        # Retried responses count as rate limited even if the last attempt succeeded
+        retries = getattr(getattr(response, "raw", None), "retries", None)
+        history = retries.history if retries is not None else ()
+        statuses = [response.status_code] + [attempt.status for attempt in history]
+        retry_after = 0.0
+        if any(status in RATE_LIMIT_STATUSES for status in statuses):
+            # Exhausted retries return the last response without waiting for its header
+            if response.status_code in RATE_LIMIT_STATUSES:
+                retry_after = _retry_after_seconds(response.headers.get("Retry-After"))
+            with self._lock:
+                self.multiplier = min(self.multiplier * self.factor, self.max_multiplier)
+                self.retry_after = retry_after
+                multiplier = self.multiplier
+        else:
+            with self._lock:
+                self.multiplier = max(self.multiplier * self.decay, 1.0)
+                self.retry_after = retry_after
+                multiplier = self.multiplier
+        metrics.gauge("throttle_multiplier", multiplier)
+
+    def delay(self, sleeping=(10, 15)):
+        """Return the time to sleep in seconds
+
+        Args:
+            sleeping (tuple, optional): Base sleep range, defaults to (10, 15)
+        """
+        with self._lock:
+            multiplier, retry_after = self.multiplier, self.retry_after
+        return max(uniform(sleeping[0], sleeping[1]) * multiplier, retry_after)
+
+    def wait(self, sleeping=(10, 15), stop=None):
+        """Sleep for `delay()` seconds
+
+        Args:
+            sleeping (tuple, optional): Base sleep range, defaults to (10, 15)
+            stop (threading.Event, optional): Event that ends the sleep early once set
+
+        Returns:
+            (bool): Whether `stop` has been set
+        """
+        if stop is None:
+            sleep(round(self.delay(sleeping), 3))
+            return False
+        return stop.wait(round(self.delay(sleeping), 3))
+
+
+THROTTLE = AdaptiveThrottle()
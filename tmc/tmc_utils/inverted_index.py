@@ -0,0 +1,295 @@
+"""Inverted index of words, topics, and authors of articles.
+
+Finding articles mentioning a word, tagged with a topic, or written by an
+author would otherwise mean scanning the lists and Counters of every row. The
+index maps each term of a field to the sorted list of the ids (row positions)
+of the articles containing it. Each posting list is stored as the gaps
+between consecutive ids, encoded with a variable number of bytes (7 bits per
+byte), so most postings take a single byte. Lists are decoded with a few
+vectorized numpy operations, so queries take milliseconds.
+
+The following fields are indexed:
+
+- `word` - Words of the title, perex, and the most common words of the content
+- `topic` - Topics (tags) of the article
+- `author` - Hashed authors of the article
+
+The module contains the following:
+
+- `InvertedIndex.build(df, sources=None)` - Builds the index of a dataframe from `csv_to_df()`
+- `InvertedIndex.load(path)` - Loads an index saved using `InvertedIndex.save(path)`
+- `InvertedIndex.query(all_of=(), any_of=(), start=None, end=None)` - Boolean query with
+  a date range
+- `InvertedIndex.locate(ids)` - Source files and rows of articles
+- `fingerprint(paths)` - Checksum of the names, sizes, and modification times of files
+"""
+
+import os
+from zlib import crc32
+import numpy as np
+import pandas as pd
+
+FIELDS = {
+    "word": ["title", "perex_short", "perex_full", "word_counter"],
+    "topic": ["topics"],
+    "author": ["authors_hash"],
+}
+
+
+def fingerprint(paths):
+    """Checksum of the names, sizes, and modification times of files in their order
+
+    Article ids are row positions in the order the source files are joined,
+    so the order matters too. Any rewrite of a file (e.g. by `reprocess.py`)
+    changes its modification time, and only the file metadata is read.
+
+    Args:
+        paths (list): Paths of the source files
+
+    Returns:
+        (int): 32-bit checksum
+    """
+    checksum = 0
+    for path in paths:
+        stat = os.stat(path)
+        line = f"{os.path.basename(path)}\t{stat.st_size}\t{stat.st_mtime_ns}\n"
+        checksum = crc32(line.encode("utf-8"), checksum)
+    return checksum
+
+
+def _encode(values):
+    """Variable-byte encode non-negative integers, the high bit marks continuation"""
+    values = values.astype(np.uint64)
+    n_bytes = np.ones(len(values), dtype=np.int64)
+    for shift in (7, 14, 21, 28, 35):
+        n_bytes += values >= (1 << shift)
+    starts = np.cumsum(n_bytes) - n_bytes
+    encoded = np.empty(int(n_bytes.sum()), dtype=np.uint8)
+    for k in range(int(n_bytes.max(initial=0))):
+        mask = n_bytes > k
+        chunk = (values[mask] >> np.uint64(7 * k)) & np.uint64(0x7F)
+        more = (n_bytes[mask] - 1 > k).astype(np.uint64) << np.uint64(7)
+        encoded[starts[mask] + k] = chunk | more
+    return encoded, n_bytes
+
+
+def _decode(encoded):
+    """Inverse of `_encode()`"""
+    if len(encoded) == 0:
+        return np.empty(0, dtype=np.int64)
+    last = (encoded & 0x80) == 0
+    ends = np.flatnonzero(last)
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    position = np.arange(len(encoded)) - np.repeat(starts, ends - starts + 1)
+    chunks = (encoded & 0x7F).astype(np.uint64) << (7 * position).astype(np.uint64)
+    return np.add.reduceat(chunks, starts).astype(np.int64)
+
+
+def _field_terms(df, columns):
+    """Return (term, article id) pairs of the given columns"""
+    terms, ids = [], []
+    for col in columns:
+        if col not in df.columns:
+            continue
+        for article_id, value in enumerate(df[col]):
+            if isinstance(value, dict):
+                value = value.keys()
+            elif not isinstance(value, (list, tuple, set)):
+                continue
+            for term in value:
+                # word_counter loaded from a .csv file may be a list of (word, count) pairs
+                terms.append(term[0] if isinstance(term, tuple) else term)
+                ids.append(article_id)
+    return terms, np.array(ids, dtype=np.int64)
+
+
+class InvertedIndex:
+    """Compressed posting lists of article ids per field and term
+
+    Use `build()` or `load()` rather than the constructor.
+
+    Args:
+        fields (dict): Mapping of field names to `(terms, offsets, postings)`
+        dates (numpy.ndarray): Publication date of each article
+        checksum (int): Output of `fingerprint()` of the source files
+        files (numpy.ndarray): Names of the source files in the order they were joined
+        file_offsets (numpy.ndarray): Id of the first article of each source file, followed by
+            the number of articles
+    """
+
+    def __init__(self, fields, dates, checksum, files, file_offsets):
+        self.fields = fields
+        self.dates = dates
+        self.checksum = checksum
+        self.files = files
+        self.file_offsets = file_offsets
+        self._lookup = {
+            field: {term: i for i, term in enumerate(terms.tolist())}
+            for field, (terms, _, _) in fields.items()
+        }
+
+    def __len__(self):
+        return len(self.dates)
+
+    @classmethod
+    def build(cls, df, sources=None):
+        """Build the index of a dataframe
+
+        Args:
+            df (pandas.core.frame.DataFrame): Output of `csv_to_df()`
+            sources (list, optional): (path, number of rows) of the source files of `df` in the
+                order they were joined, needed by `locate()` and to detect an outdated index
+
+        Returns:
+            (InvertedIndex): Index whose article ids are row positions of `df`
+        """
+        fields = {}
+        for field, columns in FIELDS.items():
+            terms, ids = _field_terms(df, columns)
+            # Sort by term, then by id, and drop duplicates
+            postings = pd.DataFrame({"term": terms, "id": ids}).drop_duplicates()
+            postings = postings.sort_values(["term", "id"], kind="mergesort")
+            if len(postings) == 0:
+                # E.g. no article has any authors
+                fields[field] = (
+                    np.empty(0, dtype=str),
+                    np.zeros(1, dtype=np.int64),
+                    np.empty(0, dtype=np.uint8),
+                )
+                continue
+            term_codes, unique_terms = pd.factorize(postings.term, sort=True)
+            ids = postings.id.to_numpy()
+
+            # The first id of each list is stored as is, the rest as gaps
+            first = np.ones(len(ids), dtype=bool)
+            first[1:] = term_codes[1:] != term_codes[:-1]
+            gaps = np.where(first, ids, ids - np.concatenate(([0], ids[:-1])))
+            encoded, n_bytes = _encode(gaps)
+
+            byte_ends = np.cumsum(n_bytes)
+            list_ends = np.append(np.flatnonzero(first)[1:], len(ids))
+            offsets = np.concatenate(([0], byte_ends[list_ends - 1])).astype(np.int64)
+            term_array = np.asarray(unique_terms)
+            if term_array.dtype == object:
+                term_array = term_array.astype(str)
+            fields[field] = (term_array, offsets, encoded)
+
+        dates = pd.to_datetime(df["date"]).to_numpy().astype("datetime64[D]")
+        sources = sources or []
+        files = np.array([os.path.basename(path) for path, _ in sources], dtype=str)
+        file_offsets = np.cumsum([0] + [rows for _, rows in sources]).astype(np.int64)
+        checksum = fingerprint([path for path, _ in sources])
+        return cls(fields, dates, checksum, files, file_offsets)
+
+    def save(self, path):
+        """Save the index as a compressed .npz file"""
+        arrays = {
+            "dates": self.dates,
+            "checksum": np.array(self.checksum, dtype=np.int64),
+            "files": self.files,
+            "file_offsets": self.file_offsets,
+        }
+        for field, (terms, offsets, postings) in self.fields.items():
+            arrays[field + "_terms"] = terms
+            arrays[field + "_offsets"] = offsets
+            arrays[field + "_postings"] = postings
+        np.savez_compressed(path, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        """Load an index saved using `save()`"""
+        with np.load(path) as data:
+            fields = {
+                field: (
+                    data[field + "_terms"],
+                    data[field + "_offsets"],
+                    data[field + "_postings"],
+                )
+                for field in FIELDS
+            }
+            # Indexes saved before the source files were recorded are never up to date
+            if "files" not in data.files:
+                return cls(
+                    fields, data["dates"], -1, np.empty(0, dtype=str), np.zeros(1, dtype=np.int64)
+                )
+            return cls(
+                fields, data["dates"], int(data["checksum"]), data["files"], data["file_offsets"]
+            )
+
+    def locate(self, ids):
+        """Return the source files and rows of articles, e.g. to load only matching articles
+
+        Args:
+            ids (numpy.ndarray): Article ids, e.g. the output of `query()`
+
+        Raises:
+            ValueError: If the index was built without its sources
+
+        Returns:
+            (dict): Mapping of file names to the row positions of the articles in each file
+        """
+        if len(self.files) == 0 or self.file_offsets[-1] != len(self.dates):
+            raise ValueError("The index was built without the source files of the articles.")
+        ids = np.asarray(ids, dtype=np.int64)
+        file_ids = np.searchsorted(self.file_offsets, ids, side="right") - 1
+        return {
+            str(self.files[i]): ids[file_ids == i] - self.file_offsets[i]
+            for i in np.unique(file_ids)
+        }
+
+    def terms(self, field):
+        """Return all indexed terms of a field"""
+        return self.fields[field][0]
+
+    def postings(self, field, term):
+        """Return the sorted ids of the articles containing a term
+
+        Args:
+            field (str): One of "word", "topic", or "author"
+            term (str or int): Word, topic, or author hash
+
+        Returns:
+            (numpy.ndarray): Article ids, i.e. row positions of the indexed dataframe
+        """
+        i = self._lookup[field].get(term)
+        if i is None:
+            return np.empty(0, dtype=np.int64)
+        _, offsets, postings = self.fields[field]
+        return np.cumsum(_decode(postings[offsets[i]: offsets[i + 1]]))
+
+    def query(self, all_of=(), any_of=(), start=None, end=None):
+        """Return the ids of the articles matching all terms of `all_of` and any of `any_of`
+
+        Example:
+            index.query(
+                all_of=[("word", "vakcína"), ("topic", "koronavirus")],
+                any_of=[("author", 1234), ("author", 5678)],
+                start="2022-01-01",
+            )
+
+        Args:
+            all_of (list, optional): (field, term) pairs combined using AND
+            any_of (list, optional): (field, term) pairs combined using OR
+            start (str or datetime, optional): Earliest publication date (inclusive)
+            end (str or datetime, optional): Latest publication date (inclusive)
+
+        Returns:
+            (numpy.ndarray): Sorted article ids, use `df.iloc[ids]` to get the articles
+        """
+        result = None
+        # Intersect the shortest lists first
+        for ids in sorted((self.postings(*pair) for pair in all_of), key=len):
+            result = ids if result is None else np.intersect1d(result, ids, assume_unique=True)
+        if any_of:
+            union = np.unique(np.concatenate([self.postings(*pair) for pair in any_of]))
+            result = union if result is None else np.intersect1d(result, union, assume_unique=True)
+        if result is None:
+            result = np.arange(len(self.dates))
+
+        dates = self.dates[result]
+        mask = np.ones(len(result), dtype=bool)
+        if start is not None:
+            mask &= dates >= np.datetime64(pd.Timestamp(start).date(), "D")
+        if end is not None:
+            mask &= dates <= np.datetime64(pd.Timestamp(end).date(), "D")
+        return result[mask]
@@ -0,0 +1,245 @@
+"""Lightweight per-stage pipeline metrics.
+
+The scraping functions report what they are doing (fetch latency per host,
+Archive.org hits and misses, Google Webcache fallbacks, parsing and cleaning
+time, downloaded bytes, throughput) by emitting metric events. Events are
+passed to every registered hook, so nothing is recorded unless a hook is
+registered. Two hooks are provided: one appending events to a JSON lines file
+and one maintaining a Prometheus textfile (e.g. for the node_exporter
+textfile collector). Events may be emitted from several threads at once, both
+hooks buffer them and write to disk at most every few seconds, on `flush()`,
+and at exit. A failing hook is reported but never interrupts the scraping.
+
+Every event is a dictionary:
+
+    {"ts": 1673000000.0, "metric": "fetch_seconds", "type": "summary",
+     "value": 1.23, "labels": {"host": "archive.org"}}
+
+The module contains the following:
+
+- `register_hook(hook)` - Registers a callable receiving every event
+- `remove_hook(hook)` - Unregisters a hook
+- `count(metric, value=1, **labels)` - Emits a counter increment
+- `observe(metric, value, **labels)` - Emits an observation (e.g. a duration)
+- `gauge(metric, value, **labels)` - Emits the current value of a gauge
+- `timed(metric, **labels)` - Context manager / decorator observing the duration of its block
+- `flush()` - Writes the buffered events of all hooks
+- `JsonLinesWriter(path, flush_interval=5.0)` - Hook appending events to a JSON lines file
+- `PrometheusTextfile(path, prefix="tmc_", write_interval=5.0)` - Hook writing a Prometheus
+  textfile
+"""
+
+import atexit
+import json
+import os
+import tempfile
+import threading
+import traceback
+from contextlib import contextmanager
+from time import monotonic, perf_counter, time
+
+_HOOKS = []
+
+
+def register_hook(hook):
+    """Register a callable that receives every emitted event
+
+    Args:
+        hook (callable): Function taking a single event dictionary
+
+    Returns:
+        (callable): The registered hook
+    """
+    _HOOKS.append(hook)
+    return hook
+
+
+def remove_hook(hook):
+    """Unregister a hook registered by `register_hook()`"""
+    if hook in _HOOKS:
+        _HOOKS.remove(hook)
+
+
+def _emit(metric, metric_type, value, labels):
+    if not _HOOKS:
+        return
+    event = {
+        "ts": time(),
+        "metric": metric,
+        "type": metric_type,
+        "value": value,
+        "labels": labels,
+    }
+    for hook in list(_HOOKS):
+        # Metrics mustn't break the scraping
+        try:
+            hook(event)
+        except Exception:  # pylint: disable=broad-except
+            traceback.print_exc()
+
+
+def count(metric, value=1, **labels):
+    """Emit a counter increment, e.g. `count("wayback_lookups", result="hit")`"""
+    _emit(metric, "counter", value, labels)
+
+
+def observe(metric, value, **labels):
+    """Emit an observation, e.g. `observe("fetch_bytes", 1024, host="archive.org")`"""
+    _emit(metric, "summary", value, labels)
+
+
+def gauge(metric, value, **labels):
+    """Emit the current value of a gauge, e.g. `gauge("articles_per_minute", 3.2)`"""
+    _emit(metric, "gauge", value, labels)
+
+
+@contextmanager
+def timed(metric, **labels):
+    """Observe the duration of the enclosed block (or decorated function) in seconds
+
+    Example:
+        with timed("parse_seconds", page="article"):
+            soup = BeautifulSoup(text, "html.parser")
+    """
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        observe(metric, perf_counter() - start, **labels)
+
+
+def flush():
+    """Write the buffered events of all registered hooks"""
+    for hook in list(_HOOKS):
+        if hasattr(hook, "flush"):
+            try:
+                hook.flush()
+            except Exception:  # pylint: disable=broad-except
+                traceback.print_exc()
+
+
+class JsonLinesWriter:
+    """Hook appending every event as a line of JSON
+
+    Args:
+        path (str): Path to the .jsonl file (appended to if it exists)
+        flush_interval (float, optional): Maximum number of seconds events are buffered for,
+            defaults to 5.0
+    """
+
+    def __init__(self, path, flush_interval=5.0):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+        self.buffer = []
+        self.last_flush = monotonic()
+        atexit.register(self.flush)
+
+    def __call__(self, event):
+        line = json.dumps(event) + "\n"
+        with self.lock:
+            self.buffer.append(line)
+            if monotonic() - self.last_flush >= self.flush_interval:
+                self._flush()
+
+    def _flush(self):
+        self.last_flush = monotonic()
+        if len(self.buffer) == 0:
+            return
+        with open(self.path, "a", encoding="utf-8") as file:
+            file.writelines(self.buffer)
+        self.buffer = []
+
+    def flush(self):
+        """Append the buffered events to the file"""
+        with self.lock:
+            self._flush()
+
+
+class PrometheusTextfile:
+    """Hook aggregating events into a Prometheus textfile
+
+    Counters are exported as totals, observations as `_sum` and `_count`
+    pairs, and gauges as their last value. The file is rewritten atomically
+    at most every `write_interval` seconds.
+
+    Args:
+        path (str): Path to the .prom file
+        prefix (str, optional): Prefix of all metric names, defaults to "tmc_"
+        write_interval (float, optional): Minimum number of seconds between two rewrites,
+            defaults to 5.0
+    """
+
+    def __init__(self, path, prefix="tmc_", write_interval=5.0):
+        self.path = path
+        self.prefix = prefix
+        self.write_interval = write_interval
+        self.lock = threading.Lock()
+        # (metric, type) -> {sorted label items -> [sum, count]}
+        self.series = {}
+        self.last_write = monotonic()
+        atexit.register(self.flush)
+
+    def __call__(self, event):
+        key = (event["metric"], event["type"])
+        labels = tuple(sorted((k, str(v)) for k, v in event["labels"].items()))
+        with self.lock:
+            values = self.series.setdefault(key, {}).setdefault(labels, [0.0, 0])
+            if event["type"] == "gauge":
+                values[0] = event["value"]
+            else:
+                values[0] += event["value"]
+            values[1] += 1
+            if monotonic() - self.last_write >= self.write_interval:
+                self._write()
+
+    @staticmethod
+    def _format_labels(labels):
+        if not labels:
+            return ""
+        escaped = [
+            '{}="{}"'.format(k, v.replace("\\", "\\\\").replace('"', '\\"')) for k, v in labels
+        ]
+        return "{" + ",".join(escaped) + "}"
+
+    def write(self):
+        """Atomically rewrite the textfile with the current aggregates"""
+        with self.lock:
+            self._write()
+
+    def flush(self):
+        """Same as `write()`, called by `metrics.flush()`"""
+        self.write()
+
+    def _write(self):
+        self.last_write = monotonic()
+        lines = []
+        for (metric, metric_type), series in sorted(self.series.items()):
+            name = self.prefix + metric
+            if metric_type == "counter":
+                # The TYPE line has to name the samples
+                lines.append(f"# TYPE {name}_total counter")
+                for labels, (total, _) in series.items():
+                    lines.append(f"{name}_total{self._format_labels(labels)} {total}")
+            elif metric_type == "gauge":
+                lines.append(f"# TYPE {name} gauge")
+                for labels, (value, _) in series.items():
+                    lines.append(f"{name}{self._format_labels(labels)} {value}")
+            else:
+                lines.append(f"# TYPE {name} summary")
+                for labels, (total, n) in series.items():
+                    lines.append(f"{name}_sum{self._format_labels(labels)} {total}")
+                    lines.append(f"{name}_count{self._format_labels(labels)} {n}")
+
+        # A unique temporary file, the collector ignores files that don't end with .prom
+        directory, name = os.path.split(os.path.abspath(self.path))
+        descriptor, temp_path = tempfile.mkstemp(prefix=name + ".", suffix=".tmp", dir=directory)
+        try:
+            # mkstemp() creates files only the owner can read, unlike the collector
+            os.chmod(temp_path, 0o644)
+            with os.fdopen(descriptor, "w", encoding="utf-8") as file:
+                file.write("\n".join(lines) + "\n")
+            os.replace(temp_path, self.path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
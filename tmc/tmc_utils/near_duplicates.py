@@ -0,0 +1,206 @@
+"""Near-duplicate article detection using MinHash and LSH.
+
+idnes.cz republishes agency copy and live-blog updates with nearly identical
+text under different links. Comparing every pair of articles is infeasible, so
+each article's set of cleaned words is summarized by a MinHash signature whose
+positions agree with the same probability as the Jaccard similarity of the
+sets. Signatures are split into bands and hashed into buckets
+(locality-sensitive hashing), so only articles sharing a bucket are compared,
+which keeps each insert sublinear in the size of the corpus. Articles whose
+estimated similarity reaches the threshold are merged into a cluster.
+
+The module contains the following:
+
+- `MinHashLSH(num_perm=128, bands=16, threshold=0.8, seed=1)` - Incremental near-duplicate index
+- `article_tokens(row)` - Set of cleaned words of an article
+- `mark_near_duplicates(df, lsh=None)` - Adds a `dup_cluster` column to a dataframe of articles
+- `drop_near_duplicates(df)` - Keeps only the earliest article of each near-duplicate cluster
+"""
+
+from zlib import crc32
+import numpy as np
+import pandas as pd
+
+# A prime larger than any 32-bit hash, (a * x + b) then fits into 64 bits
+_PRIME = np.uint64(4294967311)
+
+
+class MinHashLSH:
+    """Incremental MinHash / LSH index of article word sets
+
+    With `bands` bands of `num_perm // bands` rows, pairs of articles with a
+    Jaccard similarity above roughly `(1 / bands) ** (bands / num_perm)` become
+    candidates, which are then confirmed against `threshold`.
+
+    Args:
+        num_perm (int, optional): Number of hash functions (signature length), defaults to 128
+        bands (int, optional): Number of LSH bands, has to divide `num_perm`, defaults to 16
+        threshold (float, optional): Minimum estimated Jaccard similarity of near-duplicates,
+            defaults to 0.8
+        seed (int, optional): Seed of the hash functions, defaults to 1
+    """
+
+    def __init__(self, num_perm=128, bands=16, threshold=0.8, seed=1):
+        if num_perm % bands != 0:
+            raise ValueError("The number of bands has to divide num_perm.")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, 2**32, num_perm, dtype=np.uint64)[:, None]
+        self._b = rng.integers(0, 2**32, num_perm, dtype=np.uint64)[:, None]
+
+        self._buckets = [{} for _ in range(bands)]
+        self.signatures = {}
+        # Union-find forest, the root of each cluster is its first inserted article
+        self._parent = {}
+        self._order = {}
+        self._size = {}
+
+    def signature(self, tokens):
+        """Compute the MinHash signature of a set of tokens
+
+        Args:
+            tokens (iterable): Words of an article
+
+        Returns:
+            (numpy.ndarray): Signature of `num_perm` 32-bit values
+        """
+        # crc32 is stable across processes, unlike the built-in (salted) hash()
+        hashes = np.fromiter(
+            (crc32(token.encode("utf-8")) for token in set(tokens)), dtype=np.uint64
+        )
+        if len(hashes) == 0:
+            return np.full(self.num_perm, np.iinfo(np.uint32).max, dtype=np.uint32)
+        return ((self._a * hashes + self._b) % _PRIME).min(axis=1).astype(np.uint32)
+
+    def _find(self, key):
+        root = key
+        while self._parent[root] != root:
+            root = self._parent[root]
+        # Path compression
+        while self._parent[key] != root:
+            self._parent[key], key = root, self._parent[key]
+        return root
+
+    def _union(self, key_a, key_b):
+        root_a, root_b = self._find(key_a), self._find(key_b)
+        if root_a == root_b:
+            return
+        if self._order[root_b] < self._order[root_a]:
+            root_a, root_b = root_b, root_a
+        self._parent[root_b] = root_a
+        self._size[root_a] += self._size.pop(root_b)
+
+    def insert(self, key, tokens):
+        """Add an article and link it to its near-duplicates
+
+        Args:
+            key (hashable): Unique article identifier, e.g. its link
+            tokens (iterable): Words of the article
+
+        Returns:
+            (hashable): Key of the first inserted article of the cluster `key` belongs to
+        """
+        if key in self.signatures:
+            return self._find(key)
+
+        sig = self.signature(tokens)
+        self.signatures[key] = sig
+        self._parent[key] = key
+        self._order[key] = len(self._order)
+        self._size[key] = 1
+
+        for band, buckets in enumerate(self._buckets):
+            band_key = sig[band * self.rows: (band + 1) * self.rows].tobytes()
+            bucket = buckets.setdefault(band_key, [])
+            for candidate in bucket:
+                if self._find(candidate) == self._find(key):
+                    continue
+                if self.similarity(key, candidate) >= self.threshold:
+                    self._union(key, candidate)
+            bucket.append(key)
+
+        return self._find(key)
+
+    def similarity(self, key_a, key_b):
+        """Estimated Jaccard similarity of two inserted articles"""
+        return float(np.mean(self.signatures[key_a] == self.signatures[key_b]))
+
+    def cluster(self, key):
+        """Key of the first inserted article of the cluster `key` belongs to"""
+        return self._find(key)
+
+    def cluster_size(self, key):
+        """Number of articles in the cluster `key` belongs to"""
+        return self._size[self._find(key)]
+
+
+def article_tokens(row):
+    """Return the set of cleaned words of an article (title, full perex, and top content words)
+
+    Args:
+        row (dict or pandas.core.series.Series): Row of a dataframe of articles
+
+    Returns:
+        (set): Set of words
+    """
+    tokens = set()
+    for col in ["title", "perex_full"]:
+        if isinstance(row.get(col), list):
+            tokens.update(row[col])
+    counter = row.get("word_counter")
+    if isinstance(counter, (dict, list)):
+        tokens.update(dict(counter).keys())
+    return tokens
+
+
+def mark_near_duplicates(df, lsh=None):
+    """Add a `dup_cluster` column with the link of the first article of each near-duplicate cluster
+
+    Articles without any near-duplicates get NA. Articles are inserted ordered
+    by their date and link, so the earliest article represents its cluster
+    whatever the order of the rows. Passing the same `lsh` when loading new data
+    clusters it together with the previously loaded articles.
+
+    Args:
+        df (pandas.core.frame.DataFrame): Dataframe of articles
+        lsh (MinHashLSH, optional): Index to insert the articles into, defaults to a new one
+
+    Returns:
+        (pandas.core.frame.DataFrame): Dataframe with the `dup_cluster` column
+    """
+    if lsh is None:
+        lsh = MinHashLSH()
+
+    cols = [col for col in ["title", "perex_full", "word_counter"] if col in df.columns]
+    ordered = df.sort_values([col for col in ["date", "link"] if col in df.columns], kind="stable")
+    for link, row in zip(ordered.link, ordered[cols].to_dict("records")):
+        tokens = article_tokens(row)
+        if len(tokens) > 0:
+            lsh.insert(link, tokens)
+
+    # Clusters may also contain previously loaded articles
+    df["dup_cluster"] = [
+        lsh.cluster(link) if link in lsh.signatures and lsh.cluster_size(link) > 1 else pd.NA
+        for link in df.link
+    ]
+    return df
+
+
+def drop_near_duplicates(df):
+    """Keep only the earliest article of each near-duplicate cluster
+
+    Useful before `create_all_words()` or `create_hourly_df()` so that
+    republished articles aren't counted several times.
+
+    Args:
+        df (pandas.core.frame.DataFrame): Output of `mark_near_duplicates()`
+
+    Returns:
+        (pandas.core.frame.DataFrame): Dataframe without the near-duplicates
+    """
+    keep = df.dup_cluster.isna() | (df.dup_cluster == df.link).fillna(False)
+    return df[keep.astype(bool)].reset_index(drop=True)
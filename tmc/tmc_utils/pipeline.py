@@ -0,0 +1,364 @@
+"""Streaming scraping pipeline.
+
+Instead of collecting all article lists first and then every article of each
+list in memory, the pipeline runs the following stages at once, each in its
+own thread(s), connected by bounded queues:
+
+1. list - requests an article list, writes its partial dataframe, and emits a
+   record per article
+2. fetch - requests the article pages (several workers, e.g. one per TOR circuit)
+3. extract - parses and cleans the content of the fetched pages
+4. write - appends each finished article to the full dataframe .csv file of
+   its list
+
+Articles are written as soon as they are processed, so the memory use doesn't
+depend on the number of lists, and articles of the first list are fetched
+while the following lists are still being requested. Since the fetch workers
+run in parallel, rows are appended out of order, the index of each row is the
+position of the article in its list. Once a list is complete, its full
+dataframe is rewritten in the order of the list.
+
+A failing article, list, or `on_list_done` callback is reported and skipped.
+If a stage fails altogether, the other stages are stopped (also while they
+sleep between requests) instead of waiting for it forever, and
+`run_pipeline()` raises the error.
+
+The module contains the following:
+
+- `run_pipeline(list_numbers, url_template, tor_request=None, data_dir="data", ...)` - Scrapes
+  article lists and their articles into partial and full dataframes
+"""
+
+import queue
+import threading
+import traceback
+from os.path import join
+from random import uniform
+from time import perf_counter
+import requests
+import pandas as pd
+from tmc_utils import article_scraper as arts
+from tmc_utils import metrics, profiling
+from tmc_utils.http_session import THROTTLE
+
+# Marks the end of a stream
+_DONE = None
+# Seconds between checks whether the pipeline has been stopped while waiting on a queue
+_POLL = 0.5
+# Seconds to wait for the stages to stop, e.g. a fetch worker in the middle of a request
+_JOIN_TIMEOUT = 60
+
+
+class _Stopped(Exception):
+    """Raised in a stage when another stage has failed"""
+
+
+def _put(q, item, stop):
+    """Put an item into a bounded queue unless the pipeline is stopped"""
+    while True:
+        if stop.is_set():
+            raise _Stopped
+        try:
+            return q.put(item, timeout=_POLL)
+        except queue.Full:
+            continue
+
+
+def _get(q, stop):
+    """Get an item from a queue unless the pipeline is stopped"""
+    while True:
+        if stop.is_set():
+            raise _Stopped
+        try:
+            return q.get(timeout=_POLL)
+        except queue.Empty:
+            continue
+
+
+def _list_stage(
+    list_numbers,
+    url_template,
+    tor_request,
+    data_dir,
+    archive,
+    prefetch_snapshots,
+    list_sleeping,
+    links,
+    stop
+):
+    """Request article lists, save them as partial dataframes, and emit their articles"""
+    for i in list_numbers:
+        print(f"PAGE LIST NUMBER: {i}")
+        try:
+            with profiling.stage("list_fetch"):
+                soup = arts.soup_object_tor(
+                    url_template.format(i), tor_request, archive=archive, list_number=i
+                )
+            if soup is None:
+                print(f"List number {i} could not be obtained. Skipping.\n")
+                continue
+
+            with profiling.stage("list_extract"):
+                records = arts.LIST_EXTRACTOR.extract(soup)
+                articles = [arts.article_from_record(record) for record in records]
+            article_df = pd.DataFrame(articles, columns=arts.LIST_COLUMNS)
+            article_df.to_csv(join(data_dir, "partial_dfs", f"partial_df_{i}.csv"))
+        # A failing list mustn't stop the pipeline
+        except Exception:  # pylint: disable=broad-except
+            traceback.print_exc()
+            print(f"List number {i} could not be processed. Skipping.\n")
+            continue
+        print(f"List number {i} processed ({len(articles)} articles).\n")
+
+        if len(articles) == 0:
+            # Let the writer know that the list is done
+            _put(links, (i, None, 0, None, None), stop)
+            continue
+
+        snapshots = None
+        to_fetch = ~(article_df.premium | article_df.gallery | article_df.video)
+        if prefetch_snapshots and to_fetch.any():
+            try:
+                snapshots = arts.wayback_snapshots(
+                    article_df.link[to_fetch],
+                    tor_request,
+                    date_from=pd.to_datetime(article_df.date).min()
+                )
+            # Fall back to asking Archive.org for each article separately
+            except (requests.exceptions.RequestException, ValueError) as error:
+                print("Bulk lookup of Archive.org snapshots failed:", error)
+
+        for j, article in enumerate(articles):
+            _put(links, (i, j, len(articles), article, snapshots), stop)
+        if stop.wait(round(uniform(list_sleeping[0], list_sleeping[1]), 3)):
+            raise _Stopped
+
+
+def _fetch_stage(tor_request, archive, sleeping, links, pages, stop):
+    """Request the pages of the articles that aren't premium, galleries, or videos"""
+    while True:
+        item = _get(links, stop)
+        if item is _DONE:
+            return
+        i, j, size, article, snapshots = item
+        if article is None or article["premium"] or article["gallery"] or article["video"]:
+            _put(pages, (i, j, size, article, None, "skipped"), stop)
+            continue
+
+        try:
+            with profiling.stage("article_fetch"):
+                soup_page = arts.soup_object_request_all(
+                    "https://www.idnes.cz" + article["link"],
+                    tor_request,
+                    archive=archive,
+                    snapshots=snapshots
+                )
+        # A failing article mustn't stop the pipeline
+        except Exception:  # pylint: disable=broad-except
+            traceback.print_exc()
+            soup_page = None
+        # Give the page some breathing room, longer if we are being rate limited
+        if THROTTLE.wait(sleeping, stop):
+            raise _Stopped
+        result = "ok" if soup_page is not None else "missing"
+        _put(pages, (i, j, size, article, soup_page, result), stop)
+
+
+def _extract_stage(word_sketch, n_fetchers, pages, records, stop):
+    """Extract the content of the fetched pages"""
+    done = 0
+    while done < n_fetchers:
+        item = _get(pages, stop)
+        if item is _DONE:
+            done += 1
+            continue
+        i, j, size, article, soup_page, result = item
+        if article is None:
+            _put(records, (i, j, size, None), stop)
+            continue
+
+        content = dict.fromkeys(arts.ARTICLE_COLUMNS, pd.NA)
+        try:
+            if soup_page is not None:
+                with metrics.timed("extract_seconds"), profiling.stage("article_extract"):
+                    content = arts.parse_article(soup_page)
+                if word_sketch is not None and isinstance(content["word_counter"], list):
+                    word_sketch.update_counter(dict(content["word_counter"]))
+            metrics.count("articles_processed", result=result)
+        # A failing article mustn't stop the pipeline
+        except Exception:  # pylint: disable=broad-except
+            traceback.print_exc()
+            content = dict.fromkeys(arts.ARTICLE_COLUMNS, pd.NA)
+        _put(records, (i, j, size, {**article, **content}), stop)
+
+
+def _write_stage(data_dir, on_list_done, records, stop):
+    """Append finished articles to the full dataframes, close each once its list is complete"""
+    columns = arts.LIST_COLUMNS + arts.ARTICLE_COLUMNS
+    files = {}
+    rows = {}
+    written = 0
+    start = perf_counter()
+    try:
+        while True:
+            item = _get(records, stop)
+            if item is _DONE:
+                break
+            i, j, size, record = item
+
+            if i not in files:
+                files[i] = open(  # pylint: disable=consider-using-with
+                    join(data_dir, "full_dfs", f"full_df_{i}.csv"),
+                    "w",
+                    encoding="utf-8",
+                    newline="",
+                )
+                rows[i] = []
+            if record is not None:
+                row = pd.DataFrame([record], index=[j], columns=columns)
+                row.to_csv(files[i], header=len(rows[i]) == 0)
+                files[i].flush()
+                rows[i].append(row)
+                written += 1
+                metrics.gauge("articles_per_minute", 60 * written / (perf_counter() - start))
+                print(f"List {i}: article {len(rows[i])} / {size} saved.")
+
+            if len(rows[i]) == size:
+                list_rows = rows.pop(i)
+                files.pop(i).close()
+                if len(list_rows) > 0:
+                    list_df = pd.concat(list_rows).sort_index()
+                else:
+                    # A list without articles still gets its (empty) full dataframe
+                    list_df = pd.DataFrame(columns=columns)
+                # Replace the rows appended out of order by the list in its order
+                list_df.to_csv(join(data_dir, "full_dfs", f"full_df_{i}.csv"))
+                print(f"\nList number {i} processed. The full dataframe has been saved.\n")
+                metrics.flush()
+                if on_list_done is not None:
+                    try:
+                        on_list_done(i, list_df)
+                    except Exception:  # pylint: disable=broad-except
+                        traceback.print_exc()
+    finally:
+        # Lists that couldn't be completed (e.g. after an error in the list stage)
+        for file in files.values():
+            file.close()
+    return written
+
+
+def run_pipeline(
+    list_numbers,
+    url_template,
+    tor_request=None,
+    data_dir="data",
+    archive=None,
+    fetch_workers=None,
+    sleeping=(10, 15),
+    list_sleeping=(5, 10),
+    queue_size=64,
+    on_list_done=None,
+    word_sketch=None,
+    prefetch_snapshots=True
+):
+    """Scrape article lists and their articles into partial and full dataframes
+
+    Args:
+        list_numbers (iterable): Numbers of the article lists, e.g. `range(289, 291)`
+        url_template (str): URL of an article list with `{}` in place of its number
+        tor_request (requests.sessions.Session or tmc_utils.tor_initialization.TorCircuitPool,
+            optional): TOR requests object
+        data_dir (str, optional): Directory with the partial_dfs/ and full_dfs/ folders,
+            defaults to "data"
+        archive (tmc_utils.html_archive.HtmlArchive, optional): Archive to store the fetched
+            pages in
+        fetch_workers (int, optional): Number of articles fetched at once, defaults to the number
+            of TOR circuits of a `TorCircuitPool` and 1 otherwise
+        sleeping (tuple, optional): Sleep time inbetween article requests of a worker,
+            defaults to (10, 15)
+        list_sleeping (tuple, optional): Sleep time inbetween list requests, defaults to (5, 10)
+        queue_size (int, optional): Maximum number of items waiting between two stages,
+            defaults to 64
+        on_list_done (callable, optional): Called with the list number and the full dataframe
+            of a list once all of its articles have been saved
+        word_sketch (tmc_utils.word_sketch.SpaceSaving, optional): Sketch updated with the
+            words of each processed article
+        prefetch_snapshots (bool, optional): Resolve the Archive.org snapshots of each list
+            using `wayback_snapshots()` before fetching its articles, defaults to True
+
+    Raises:
+        RuntimeError: If a stage of the pipeline failed, the other stages are stopped
+
+    Returns:
+        (int): Number of saved articles
+    """
+    if fetch_workers is None:
+        fetch_workers = len(tor_request) if hasattr(tor_request, "sessions") else 1
+
+    links = queue.Queue(queue_size)
+    # Parsed pages take the most memory
+    pages = queue.Queue(max(fetch_workers, queue_size // 8))
+    records = queue.Queue(queue_size)
+    # Set when a stage fails, the other stages then stop instead of waiting for it
+    stop = threading.Event()
+    errors = []
+
+    def run_stage(stage, *args, output, n_done=1):
+        try:
+            stage(*args, stop)
+            for _ in range(n_done):
+                _put(output, _DONE, stop)
+        except _Stopped:
+            pass
+        except BaseException as error:  # pylint: disable=broad-except
+            traceback.print_exc()
+            errors.append(error)
+            stop.set()
+
+    list_args = (
+        list_numbers,
+        url_template,
+        tor_request,
+        data_dir,
+        archive,
+        prefetch_snapshots,
+        list_sleeping,
+        links
+    )
+
+    def list_stage():
+        run_stage(_list_stage, *list_args, output=links, n_done=fetch_workers)
+
+    def fetch_stage():
+        run_stage(_fetch_stage, tor_request, archive, sleeping, links, pages, output=pages)
+
+    def extract_stage():
+        run_stage(_extract_stage, word_sketch, fetch_workers, pages, records, output=records)
+
+    threads = [threading.Thread(target=list_stage, name="list", daemon=True)]
+    threads += [
+        threading.Thread(target=fetch_stage, name=f"fetch-{n}", daemon=True)
+        for n in range(fetch_workers)
+    ]
+    threads.append(threading.Thread(target=extract_stage, name="extract", daemon=True))
+    for thread in threads:
+        thread.start()
+
+    # Write in the calling thread so that `on_list_done` runs there too
+    try:
+        written = _write_stage(data_dir, on_list_done, records, stop)
+    except _Stopped:
+        written = None
+    except BaseException as error:
+        errors.append(error)
+        raise
+    finally:
+        if errors:
+            stop.set()
+        for thread in threads:
+            thread.join(_JOIN_TIMEOUT)
+            if thread.is_alive():
+                print(f"The {thread.name} stage hasn't stopped, leaving it behind.")
+    if errors:
+        raise RuntimeError("A stage of the pipeline failed.") from errors[0]
+    return written
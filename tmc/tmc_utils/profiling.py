@@ -0,0 +1,322 @@
+"""Opt-in profiling of the scraping and analysis stages.
+
+Profiling is off unless the `TMC_PROFILE` environment variable is set (to a
+report directory, or to 1 for `profiles/`), `enable()` is called, or
+`get_data.py` is run with `--profile`. Functions and blocks marked as stages
+(e.g. `add_content()`, `sentence_cleaner_cz()`, `csv_to_df()`) then record:
+
+- a sampled CPU profile - a background thread samples the call stacks of the
+  threads inside a stage every few milliseconds, stacks are counted for every
+  stage they're in (i.e. inclusively), and written in the collapsed stack
+  format (`<stage>.collapsed`), which flamegraph.pl, inferno, or speedscope
+  turn into flame graphs
+- the number of calls and the wall and CPU time spent in the stage
+- the tracemalloc peak of memory allocated during a call of the stage, and a
+  tracemalloc snapshot (`<stage>.tracemalloc`, load it with
+  `tracemalloc.Snapshot.load()`) taken after a call with (nearly) the highest
+  peak, if it's at least 1 MiB
+
+The peak is measured for the whole process, so it includes memory allocated
+by other threads at the same time (e.g. the other stages of the pipeline).
+Tracing memory slows allocation-heavy stages down several times, set
+`TMC_PROFILE_MEMORY=0` (or pass `--profile-cpu-only`) to measure time only.
+Only the main process is profiled, worker processes (e.g. of
+`extract_batch()`) don't inherit the profiler.
+
+Each run writes a new `<report dir>/<timestamp>/` directory with the files
+above and `summary.json`. Two runs can be compared from the `tmc/` directory,
+by the average wall and CPU time per call and by the highest peak of any
+single call, so runs of different sizes are comparable:
+
+    python -m tmc_utils.profiling compare profiles/<old run> profiles/<new run>
+
+The module contains the following:
+
+- `enable(report_dir="profiles", interval=0.005, memory=True)` - Starts profiling
+- `stage(name)` - Context manager / decorator marking a profiled stage
+- `write_report()` - Writes the report of the current run (also done at exit)
+- `compare_reports(old_dir, new_dir, tolerance=0.25)` - Compares the summaries of two runs
+"""
+
+import argparse
+import atexit
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import tracemalloc
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from time import perf_counter, sleep, thread_time
+
+PROFILE_ENV = "TMC_PROFILE"
+PROFILE_MEMORY_ENV = "TMC_PROFILE_MEMORY"
+_SNAPSHOT_GROWTH = 1.5
+_SNAPSHOT_MIN_BYTES = 2**20
+# Memory of imported modules isn't interesting in the snapshots
+_IGNORED = (
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, tracemalloc.__file__),
+)
+
+_PROFILER = None
+
+
+class _Profiler:
+    """State of an enabled profiling run"""
+
+    def __init__(self, report_dir, interval, memory):
+        self.run_dir = os.path.join(report_dir, datetime.now().strftime("%Y%m%d-%H%M%S"))
+        self.interval = interval
+        self.memory = memory
+        self.started = datetime.now().isoformat(timespec="seconds")
+        self.lock = threading.Lock()
+        # Thread id -> stack of the stages the thread is in
+        self.active = defaultdict(list)
+        self.stacks = defaultdict(Counter)
+        self.stats = defaultdict(
+            lambda: {"calls": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0, "peak_bytes": 0}
+        )
+        self.best_snapshot = {}
+        self.snapshot_peaks = {}
+        self.running = True
+        self.sampler = threading.Thread(target=self._sample, name="profiler", daemon=True)
+
+    def _sample(self):
+        while self.running:
+            sleep(self.interval)
+            frames = sys._current_frames()  # pylint: disable=protected-access
+            with self.lock:
+                active = [
+                    (tid, {entry.name for entry in entries})
+                    for tid, entries in self.active.items()
+                    if entries
+                ]
+            for tid, names in active:
+                frame = frames.get(tid)
+                if frame is None:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    filename = os.path.basename(code.co_filename)
+                    stack.append(f"{code.co_name} ({filename}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                collapsed = ";".join(reversed(stack))
+                with self.lock:
+                    for name in names:
+                        self.stacks[name][collapsed] += 1
+
+    def observe_peak(self):
+        """Fold the current tracemalloc peak into all open stages before it's reset"""
+        if not self.memory:
+            return
+        peak = tracemalloc.get_traced_memory()[1]
+        for entries in self.active.values():
+            for entry in entries:
+                entry.peak = max(entry.peak, peak)
+
+
+class _OpenStage:
+    """A call of a stage that hasn't finished yet"""
+
+    def __init__(self, name, start_memory):
+        self.name = name
+        self.start_memory = start_memory
+        self.peak = start_memory
+
+
+def _disable_in_child():
+    """Forked children inherit the profiler without its sampler thread, maybe with its lock held"""
+    global _PROFILER
+    if _PROFILER is None:
+        return
+    if _PROFILER.memory:
+        tracemalloc.stop()
+    _PROFILER = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_disable_in_child)
+
+
+def enable(report_dir="profiles", interval=0.005, memory=True):
+    """Start profiling the stages of this process
+
+    Args:
+        report_dir (str, optional): Directory of the reports, defaults to "profiles"
+        interval (float, optional): Time between two CPU samples in seconds, defaults to 0.005
+        memory (bool, optional): Trace memory allocations using tracemalloc, which slows
+            allocation-heavy code (e.g. parsing HTML) down several times, defaults to True
+
+    Returns:
+        (str): Directory the report of this run will be written to
+    """
+    global _PROFILER
+    if _PROFILER is not None:
+        return _PROFILER.run_dir
+
+    _PROFILER = _Profiler(report_dir, interval, memory)
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    _PROFILER.sampler.start()
+    atexit.register(write_report)
+    print(f"Profiling enabled, the report will be written to {_PROFILER.run_dir}.")
+    return _PROFILER.run_dir
+
+
+@contextmanager
+def stage(name):
+    """Profile the enclosed block (or decorated function) as the stage `name`
+
+    Does nothing unless profiling is enabled.
+
+    Example:
+        with profiling.stage("list_fetch"):
+            soup = soup_object_tor(url, tor_request)
+    """
+    profiler = _PROFILER
+    if profiler is None:
+        yield
+        return
+
+    tid = threading.get_ident()
+    with profiler.lock:
+        profiler.observe_peak()
+        if profiler.memory:
+            tracemalloc.reset_peak()
+            entry = _OpenStage(name, tracemalloc.get_traced_memory()[0])
+        else:
+            entry = _OpenStage(name, 0)
+        profiler.active[tid].append(entry)
+    wall, cpu = perf_counter(), thread_time()
+    try:
+        yield
+    finally:
+        wall, cpu = perf_counter() - wall, thread_time() - cpu
+        with profiler.lock:
+            profiler.observe_peak()
+            profiler.active[tid].pop()
+            peak = max(entry.peak - entry.start_memory, 0)
+            stats = profiler.stats[name]
+            stats["calls"] += 1
+            stats["wall_seconds"] += wall
+            stats["cpu_seconds"] += cpu
+            stats["peak_bytes"] = max(stats["peak_bytes"], peak)
+            # Snapshots are slow, take one only if the peak grows considerably
+            snapshot = profiler.memory and peak >= max(
+                _SNAPSHOT_GROWTH * profiler.snapshot_peaks.get(name, 0), _SNAPSHOT_MIN_BYTES
+            )
+            if snapshot:
+                profiler.snapshot_peaks[name] = peak
+        if snapshot:
+            profiler.best_snapshot[name] = tracemalloc.take_snapshot().filter_traces(_IGNORED)
+
+
+def write_report():
+    """Write the report of the current run
+
+    Returns:
+        (str): Directory of the report, None if profiling isn't enabled
+    """
+    profiler = _PROFILER
+    if profiler is None:
+        return None
+
+    os.makedirs(profiler.run_dir, exist_ok=True)
+    with profiler.lock:
+        stats = {name: dict(values) for name, values in profiler.stats.items()}
+        stacks = {name: dict(counter) for name, counter in profiler.stacks.items()}
+    for name, values in stats.items():
+        values["samples"] = sum(stacks.get(name, {}).values())
+
+    for name, counter in stacks.items():
+        path = os.path.join(profiler.run_dir, f"{name}.collapsed")
+        with open(path, "w", encoding="utf-8") as file:
+            for collapsed, samples in sorted(counter.items()):
+                file.write(f"{collapsed} {samples}\n")
+    for name, snapshot in profiler.best_snapshot.items():
+        snapshot.dump(os.path.join(profiler.run_dir, f"{name}.tracemalloc"))
+
+    summary = {
+        "started": profiler.started,
+        "argv": sys.argv,
+        "python": sys.version.split()[0],
+        "interval": profiler.interval,
+        "memory": profiler.memory,
+        "stages": stats,
+    }
+    with open(os.path.join(profiler.run_dir, "summary.json"), "w", encoding="utf-8") as file:
+        json.dump(summary, file, indent=2)
+    return profiler.run_dir
+
+
+def _per_call(values):
+    # The peak is the highest of any single call already, it isn't divided
+    calls = max(values["calls"], 1)
+    return {
+        "wall_seconds": values["wall_seconds"] / calls,
+        "cpu_seconds": values["cpu_seconds"] / calls,
+        "peak_bytes": values["peak_bytes"],
+    }
+
+
+def compare_reports(old_dir, new_dir, tolerance=0.25):
+    """Compare the average time per call and the highest peak memory of a call of two runs
+
+    Args:
+        old_dir (str): Report directory of the reference run
+        new_dir (str): Report directory of the new run
+        tolerance (float, optional): Allowed relative increase, defaults to 0.25
+
+    Returns:
+        (list): Tuples of (stage, measure, old value, new value, regressed)
+    """
+    with open(os.path.join(old_dir, "summary.json"), encoding="utf-8") as file:
+        old = json.load(file)["stages"]
+    with open(os.path.join(new_dir, "summary.json"), encoding="utf-8") as file:
+        new = json.load(file)["stages"]
+
+    rows = []
+    for name in sorted(set(old) & set(new)):
+        old_values, new_values = _per_call(old[name]), _per_call(new[name])
+        for measure, old_value in old_values.items():
+            new_value = new_values[measure]
+            regressed = old_value > 0 and new_value > old_value * (1 + tolerance)
+            rows.append((name, measure, old_value, new_value, regressed))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    compare = subparsers.add_parser("compare", help="Compare the reports of two runs")
+    compare.add_argument("old", help="Report directory of the reference run")
+    compare.add_argument("new", help="Report directory of the new run")
+    compare.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative increase")
+    args = parser.parse_args()
+
+    rows = compare_reports(args.old, args.new, args.tolerance)
+    print(f"{'stage':<24} {'measure':<14} {'old':>14} {'new':>14}")
+    for name, measure, old_value, new_value, regressed in rows:
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{name:<24} {measure:<14} {old_value:>14.6g} {new_value:>14.6g}{flag}")
+    if any(row[-1] for row in rows):
+        raise SystemExit(1)
+
+
+# Spawned worker processes import the module again, only the main process profiles
+_MAIN_PROCESS = multiprocessing.current_process().name == "MainProcess"
+if os.environ.get(PROFILE_ENV, "") not in ("", "0") and _MAIN_PROCESS:
+    _value = os.environ[PROFILE_ENV]
+    enable(
+        "profiles" if _value.lower() in ("1", "true", "yes") else _value,
+        memory=os.environ.get(PROFILE_MEMORY_ENV, "1") != "0",
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Streaming statistics about publication times.
+
+Publication times are stored with a minute resolution, which means that a
+histogram with one bin per minute of the day (1440 bins) describes them
+exactly. The histogram is cheap to update, two histograms are merged by
+adding them up, and the mean, any quantile, or the hourly distribution can be
+read off of it without going back to the articles.
+
+The module contains the following:
+
+- `PublicationTimes()` - Mergeable accumulator of publication times
+- `format_minutes(minutes)` - Formats minutes after midnight as "H:MM"
+"""
+
+import numpy as np
+import pandas as pd
+
+MINUTES_PER_DAY = 24 * 60
+
+
+def format_minutes(minutes):
+    """Format minutes after midnight as "H:MM"
+
+    Args:
+        minutes (float): Minutes after midnight
+
+    Returns:
+        (str): Time of day, e.g. "14:05"
+    """
+    minutes = int(round(minutes))
+    return f"{minutes // 60}:{minutes % 60:02d}"
+
+
+class PublicationTimes:
+    """Accumulate publication times into a per-minute histogram
+
+    Accumulators built from different article lists can be merged using `+`
+    or `merge()` without rescanning the articles.
+    """
+
+    def __init__(self, histogram=None):
+        if histogram is None:
+            histogram = np.zeros(MINUTES_PER_DAY, dtype="int64")
+        self.histogram = np.asarray(histogram, dtype="int64")
+
+    @classmethod
+    def from_df(cls, df):
+        """Create an accumulator from a dataframe of articles
+
+        Args:
+            df (pandas.core.frame.DataFrame): Dataframe with `time_hour` and `time_min` columns
+
+        Returns:
+            (PublicationTimes): Accumulator of the publication times in `df`
+        """
+        acc = cls()
+        acc.add(df.time_hour, df.time_min)
+        return acc
+
+    def add(self, hours, minutes):
+        """Add publication times, rows with a missing hour or minute are skipped
+
+        Args:
+            hours (array-like): Hours of publication
+            minutes (array-like): Minutes of publication
+        """
+        # Drop hours and minutes together so that they stay aligned
+        times = pd.DataFrame(
+            {"hour": pd.Series(hours).to_numpy(), "min": pd.Series(minutes).to_numpy()}
+        ).dropna()
+        minute_of_day = (
+            times["hour"].astype("int64") * 60 + times["min"].astype("int64")
+        ).to_numpy()
+        self.histogram += np.bincount(minute_of_day, minlength=MINUTES_PER_DAY)
+
+    def merge(self, other):
+        """Return a new accumulator combining `self` and `other`"""
+        return PublicationTimes(self.histogram + other.histogram)
+
+    def __add__(self, other):
+        return self.merge(other)
+
+    @property
+    def count(self):
+        """Number of accumulated publication times"""
+        return int(self.histogram.sum())
+
+    def mean(self):
+        """Mean publication time in minutes after midnight"""
+        if self.count == 0:
+            return np.nan
+        return float(np.dot(np.arange(MINUTES_PER_DAY), self.histogram) / self.count)
+
+    def quantile(self, q):
+        """Publication time quantile(s) in minutes after midnight
+
+        Args:
+            q (float or array-like): Quantile(s) between 0 and 1
+
+        Returns:
+            (float or numpy.ndarray): Quantile(s) in minutes after midnight
+        """
+        if self.count == 0:
+            return np.full(np.shape(q), np.nan) if np.ndim(q) else np.nan
+        cumulative = np.cumsum(self.histogram)
+        # Same interpolation as numpy.quantile(method="linear") on the raw values
+        position = np.asarray(q, dtype="float64") * (self.count - 1)
+        lower = np.searchsorted(cumulative, np.floor(position), side="right")
+        upper = np.searchsorted(cumulative, np.ceil(position), side="right")
+        result = lower + (upper - lower) * (position - np.floor(position))
+        return float(result) if np.ndim(result) == 0 else result
+
+    def median(self):
+        """Median publication time in minutes after midnight"""
+        return self.quantile(0.5)
+
+    def hourly_histogram(self):
+        """Number of publications in each hour of the day
+
+        Returns:
+            (pandas.core.series.Series): Counts indexed by hour (0-23)
+        """
+        return pd.Series(
+            self.histogram.reshape(24, 60).sum(axis=1), index=pd.RangeIndex(24, name="hour")
+        )
@@ -0,0 +1,128 @@
+"""Re-derive partial and full dataframes from an HTML archive.
+
+Parses the article lists and article pages stored by `get_data.py` in an
+`HtmlArchive` using all CPU cores, without accessing the internet. This makes
+it possible to re-run the parsing and text cleaning (e.g. after changing
+`sentence_cleaner_cz()` or the extraction specs) without re-scraping. The output
+has the same format as the .csv files produced by `get_data.py`.
+
+Run from the `tmc/` directory:
+
+    python -m tmc_utils.reprocess data/archive/html_archive.gz data/
+
+The module contains the following functions:
+
+- `join_articles(article_df, articles)` - Adds parsed article pages to a partial dataframe
+- `reprocess_archive(archive_path, processes=None)` - Parses an archive in parallel
+"""
+
+import argparse
+from os.path import join
+import pandas as pd
+from tmc_utils.author_ids import ensure_author_key
+from tmc_utils.article_scraper import (
+    IDNES_ARTICLE_SPEC,
+    IDNES_LIST_SPEC,
+    article_df_from_records,
+    article_from_fields,
+)
+from tmc_utils.extractor import ExtractorPool
+from tmc_utils.html_archive import HtmlArchive, read_record
+
+IDNES = "https://www.idnes.cz"
+ARTICLE_KEYS = ["perex_full", "word_counter", "authors_hash", "topics"]
+
+
+def _read_entry(task):
+    path, entry = task
+    return read_record(path, entry["offset"], entry["length"])
+
+
+def join_articles(article_df, articles):
+    """Add parsed article pages to a dataframe generated by `generate_article_df`
+
+    Args:
+        article_df (pandas.core.frame.DataFrame): Dataframe with article properties
+        articles (dict): Mapping of article links to outputs of `parse_article()`
+
+    Returns:
+        (pandas.core.frame.DataFrame): Dataframe with article properties and other content
+    """
+    in_article_dict = {key: [] for key in ARTICLE_KEYS}
+
+    for j, path in enumerate(article_df.link):
+        article = articles.get(path)
+        # Same as in `add_content()`, skipped and missing articles have no content
+        skipped = article_df.premium[j] or article_df.gallery[j] or article_df.video[j]
+        for key in ARTICLE_KEYS:
+            in_article_dict[key].append(pd.NA if skipped or article is None else article[key])
+
+    return pd.concat([article_df, pd.DataFrame(in_article_dict)], axis=1)
+
+
+def reprocess_archive(archive_path, processes=None):
+    """Parse all pages of an archive in parallel
+
+    Later records of the same URL take precedence over earlier ones. Article
+    lists stored without a `list_number` can't be named like the output of
+    `get_data.py`, so they are skipped.
+
+    Args:
+        archive_path (str): Path to the archive written by `HtmlArchive`
+        processes (int, optional): Number of worker processes, defaults to the number of CPUs
+
+    Returns:
+        partial_dfs (dict): Mapping of list numbers to partial dataframes
+        full_dfs (dict): Mapping of list numbers to full dataframes
+    """
+    archive = HtmlArchive(archive_path)
+    list_entries = archive.entries("list")
+    article_entries = archive.entries("article")
+
+    unnumbered = sum("list_number" not in entry for entry in list_entries)
+    if unnumbered > 0:
+        print(f"Skipping {unnumbered} article lists stored without a list number.")
+        list_entries = [entry for entry in list_entries if "list_number" in entry]
+
+    # Workers read the records themselves, so the documents aren't sent between processes
+    with ExtractorPool(
+        {"list": IDNES_LIST_SPEC, "article": IDNES_ARTICLE_SPEC},
+        processes,
+        load=_read_entry,
+        postprocess={"list": article_df_from_records, "article": article_from_fields},
+    ) as pool:
+        list_dfs = pool.map("list", [(archive_path, entry) for entry in list_entries], 1)
+        article_dicts = pool.map("article", [(archive_path, entry) for entry in article_entries])
+    partial_dfs = {
+        entry["list_number"]: partial_df for entry, partial_df in zip(list_entries, list_dfs)
+    }
+    articles = {
+        entry["url"].replace(IDNES, ""): article
+        for entry, article in zip(article_entries, article_dicts)
+    }
+
+    full_dfs = {
+        list_number: join_articles(partial_df, articles)
+        for list_number, partial_df in partial_dfs.items()
+    }
+    return partial_dfs, full_dfs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("archive", help="Path to the HTML archive")
+    parser.add_argument("data_dir", help="Directory with the partial_dfs/ and full_dfs/ folders")
+    parser.add_argument("--processes", type=int, default=None, help="Number of worker processes")
+    args = parser.parse_args()
+
+    # The same key as `get_data.py`, so the author ids match
+    ensure_author_key(join(args.data_dir, "author_key"))
+    partial_dfs, full_dfs = reprocess_archive(args.archive, args.processes)
+    for list_number, partial_df in partial_dfs.items():
+        partial_df.to_csv(join(args.data_dir, "partial_dfs", f"partial_df_{list_number}.csv"))
+        full_dfs[list_number].to_csv(join(args.data_dir, "full_dfs", f"full_df_{list_number}.csv"))
+    print(f"Reprocessed {len(partial_dfs)} lists from {args.archive}.")
+
+
+if __name__ == "__main__":
+    main()
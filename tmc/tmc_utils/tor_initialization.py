@@ -1,93 +1,380 @@
 """Initialize TOR for requests.
 
 This module facilitates the usage of TOR for making requests.
-Note that `tor.exe` needs to be installed and added in the user's PATH.
+Note that the `tor` executable (`tor.exe` on Windows) needs to be installed
+and added in the user's PATH.
 
-The module contains the following functions:
+A single TOR circuit is slow and gets rate limited quickly. TOR can be
+launched with several SOCKS ports instead, and streams received on different
+ports are always isolated from one another, i.e. each port uses its own
+circuit (and most likely its own exit node). `TorCircuitPool` spreads the
+requests over these circuits round-robin, replaces rate-limited circuits, and
+retries the request through another circuit instead of waiting on the same one.
+
+The module contains the following:
 
 - `tor_available()` - Checks if TOR is installed
-- `get_tor_session()` - Prepares the SOCKS proxy for TOR
-- `initiate_tor()` - Starts the tor.exe process in Windows
-- `kill_tor_process()` - Terminates the tor.exe process in Windows
+- `get_tor_session(port=9050)` - Prepares the SOCKS proxy for TOR
+- `initiate_tor(n_circuits=1, socks_port=9050, control_port=None)` - Starts the TOR process
+- `kill_tor_process(tor_process=None)` - Terminates the TOR processes started by `initiate_tor()`
+- `TorCircuitPool(socks_ports, control_port=None, host="127.0.0.1", cooldown=60)` - Round-robin
+  pool of sessions, one per isolated circuit
 """
 
 import os
+import getpass
+import signal
 import subprocess
 import re
+import shutil
+import tempfile
+import threading
+from itertools import count
+from secrets import token_hex
+from time import monotonic
 import requests
+import stem
+import stem.control
 import stem.process
+from tmc_utils import metrics
+from tmc_utils.http_session import get_session, RATE_LIMIT_STATUSES
+
+
+# PIDs of the TOR processes started by `initiate_tor()`, kept across runs of the scraper
+_PID_FILE = os.path.join(tempfile.gettempdir(), f"tmc_tor_{getpass.getuser()}.pids")
+_PID_LOCK = threading.Lock()
+
+
+def _read_pids():
+    try:
+        with open(_PID_FILE, encoding="utf-8") as file:
+            return {int(line) for line in file if line.strip().isdigit()}
+    except OSError:
+        return set()
+
+
+def _write_pids(pids):
+    with open(_PID_FILE, "w", encoding="utf-8") as file:
+        file.writelines(f"{pid}\n" for pid in sorted(pids))
+
+
+def _is_tor(pid):
+    """Whether `pid` is still a TOR process, PIDs are reused once a process ends"""
+    if os.name == "nt":
+        tasks = subprocess.run(
+            ["tasklist", "/FI", f"PID eq {pid}", "/FO", "CSV", "/NH"],
+            stdout=subprocess.PIPE,
+            check=False,
+        )
+        return '"tor.exe"' in tasks.stdout.decode("utf-8", "replace").lower()
+    if os.path.isfile(f"/proc/{pid}/comm"):
+        with open(f"/proc/{pid}/comm", encoding="utf-8") as file:
+            return file.read().strip() == "tor"
+    name = subprocess.run(["ps", "-p", str(pid), "-o", "comm="], stdout=subprocess.PIPE)
+    return os.path.basename(name.stdout.decode("utf-8", "replace").strip()) == "tor"
 
 
 def tor_available():
     """Check if TOR is installed"""
 
-    if os.name == "nt":
-        # Find the path of tor.exe
-        byte_path = subprocess.run(["where", "tor"], stdout=subprocess.PIPE)
-        tor_path = byte_path.stdout.decode("utf-8").strip()
-        # Check if tor.exe is installed
-        if len(tor_path) == 0:
-            print(
-                "The TOR executable could not be found.",
-                "Please, check if tor.exe is installed or added in PATH.",
-            )
-            return False
-        return True
+    # Find the path of tor(.exe)
+    if shutil.which("tor") is None:
+        print(
+            "The TOR executable could not be found.",
+            "Please, check if TOR is installed or added in PATH.",
+        )
+        return False
+    return True
 
-    print("Sorry, Windows 10/11 is needed to route requests through TOR.")
-    return False
 
+def _proxies(port, host="127.0.0.1", username=None):
+    # Different SOCKS credentials on the same port are isolated from each other too
+    auth = f"{username}:{username}@" if username is not None else ""
+    proxy = f"socks5://{auth}{host}:{port}"
+    return {"http": proxy, "https": proxy}
 
-def get_tor_session():
+
+def get_tor_session(port=9050):
     """Set up the SOCKS5 proxy for TOR
 
+    Args:
+        port (int, optional): SOCKS port of the TOR process, defaults to 9050
+
     Returns:
-        (requests.sessions.Session): A session object with custom proxies
+        (requests.sessions.Session): A pooled session object with retries and custom proxies
     """
-    session = requests.session()
-    session.proxies = {
-        "http": "socks5://127.0.0.1:9050",
-        "https": "socks5://127.0.0.1:9050",
-    }
-    return session
+    return get_session(proxies=_proxies(port))
+
 
+def initiate_tor(n_circuits=1, socks_port=9050, control_port=None):
+    """Starts the TOR process
 
-def initiate_tor():
-    """Starts the tor.exe process
+    With `n_circuits` larger than 1, TOR listens on the consecutive SOCKS
+    ports `socks_port`, `socks_port + 1`, ..., each of them isolated.
+
+    Args:
+        n_circuits (int, optional): Number of SOCKS ports, defaults to 1
+        socks_port (int, optional): First SOCKS port, defaults to 9050
+        control_port (int, optional): Control port used to request new circuits, defaults to
+            no control port
 
     Raises:
-        SystemExit: Exits on non-Windows systems or when tor.exe isn't found
+        ValueError: If the control port is one of the SOCKS ports
+        SystemExit: Exits when the TOR executable isn't found
 
     Returns:
-        (subprocess.Popen): Starts the tor.exe process
+        (subprocess.Popen): Starts the TOR process
     """
+    if control_port is not None and socks_port <= control_port < socks_port + n_circuits:
+        raise ValueError("The control port can't be one of the SOCKS ports.")
     if not tor_available():
         raise SystemExit
 
-    # Find the path of tor.exe
-    byte_path = subprocess.run(["where", "tor"], stdout=subprocess.PIPE)
-    tor_path = byte_path.stdout.decode("utf-8").strip()
+    # Find the path of tor(.exe)
+    tor_path = shutil.which("tor")
+
+    # Streams on different ports, or with different SOCKS credentials, never share a circuit
+    config = {
+        "SocksPort": [f"{socks_port + i} IsolateSOCKSAuth" for i in range(n_circuits)],
+    }
+    if control_port is not None:
+        config["ControlPort"] = str(control_port)
+        config["CookieAuthentication"] = "1"
 
     # Start TOR process
-    port = 9050
     tor_process = stem.process.launch_tor_with_config(
-        config={
-            "SocksPort": str(port),
-        },
+        config=config,
         init_msg_handler=lambda line: print(line)
         if re.search("Bootstrapped", line)
         else False,
         tor_cmd=tor_path,
+        take_ownership=True,
     )
+    with _PID_LOCK:
+        _write_pids(_read_pids() | {tor_process.pid})
     return tor_process
 
 
-def kill_tor_process():
-    """Terminates the tor.exe process"""
-    if os.name == "nt":
-        # Kill the executable ungracefully as tor_process.kill() did not work?
-        killmsg = subprocess.run(
-            ["taskkill", "/im", "tor.exe", "/F"], stdout=subprocess.PIPE
-        )
-        return print(str(killmsg.stdout.decode("utf-8")))
-    return print("Unable to kill the TOR process.")
+def kill_tor_process(tor_process=None):
+    """Terminates the TOR process
+
+    Other TOR processes of the user (e.g. the Tor Browser) are never touched.
+
+    Args:
+        tor_process (subprocess.Popen, optional): Output of `initiate_tor()`, if not supplied,
+            all TOR processes started by `initiate_tor()` (also in previous runs) are terminated
+    """
+    with _PID_LOCK:
+        pids = _read_pids()
+        if tor_process is not None:
+            tor_process.kill()
+            tor_process.wait()
+            _write_pids(pids - {tor_process.pid})
+            return print("The TOR process has been terminated.")
+
+        killed = 0
+        for pid in pids:
+            if not _is_tor(pid):
+                continue
+            if os.name == "nt":
+                # Kill the executable ungracefully as tor_process.kill() did not work?
+                subprocess.run(["taskkill", "/PID", str(pid), "/F"], stdout=subprocess.PIPE)
+            else:
+                try:
+                    os.kill(pid, signal.SIGTERM)
+                except OSError as error:
+                    print(f"Unable to kill the TOR process {pid}:", error)
+                    continue
+            killed += 1
+        _write_pids(set())
+    return print(f"{killed} TOR processes have been terminated.")
+
+
+class TorCircuitPool:
+    """Round-robin pool of sessions, each using its own TOR circuit
+
+    The pool can be passed wherever a TOR requests object is expected, since
+    `get()` sends the request through the next healthy circuit. Circuits that
+    get rate limited or fail are moved to a fresh circuit by changing their
+    SOCKS credentials, and the request is retried through the next circuit.
+    The sessions therefore don't retry rate-limited responses themselves,
+    which would wait on the same circuit, and retry connection errors only
+    once. If a control port is supplied, NEWNYM is signalled as well so that
+    no previously built circuits are reused. Circuits that fail are skipped
+    for `cooldown` seconds and then given another chance. The pool is thread
+    safe, so several threads may fetch through it at once.
+
+    Args:
+        socks_ports (list): SOCKS ports of the TOR process, e.g. `range(9050, 9054)`
+        control_port (int, optional): Control port of the TOR process
+        host (str, optional): Address of the TOR process, defaults to "127.0.0.1"
+        cooldown (float, optional): Seconds a failed circuit is skipped for, defaults to 60
+    """
+
+    def __init__(self, socks_ports, control_port=None, host="127.0.0.1", cooldown=60):
+        self.host = host
+        self.control_port = control_port
+        self.cooldown = cooldown
+        self.ports = list(socks_ports)
+        # Failures are retried through another circuit by `get()` rather than by the session
+        self.sessions = [get_session(retries=1, retry_statuses=()) for _ in self.ports]
+        # Monotonic time until which each circuit is skipped
+        self.down_until = [0.0] * len(self.ports)
+        self._lock = threading.Lock()
+        self._next = count()
+        self._controller = None
+        for index in range(len(self.ports)):
+            self._new_credentials(index)
+
+    def __len__(self):
+        return len(self.sessions)
+
+    @property
+    def healthy(self):
+        """Whether each circuit is used at the moment, i.e. isn't cooling down after a failure"""
+        now = monotonic()
+        return [now >= until for until in self.down_until]
+
+    def _new_credentials(self, index):
+        session = self.sessions[index]
+        # Adapters keep a SOCKS connection pool per proxy URL, the old ones are never used again
+        for proxy in set(session.proxies.values()):
+            for adapter in session.adapters.values():
+                manager = adapter.proxy_manager.pop(proxy, None)
+                if manager is not None:
+                    manager.clear()
+        session.proxies = _proxies(self.ports[index], self.host, token_hex(8))
+
+    def _mark_down(self, index):
+        with self._lock:
+            self.down_until[index] = monotonic() + self.cooldown
+        metrics.gauge("tor_healthy_circuits", sum(self.healthy))
+
+    def session(self):
+        """Return the session of the next healthy circuit
+
+        If all circuits are cooling down, the one that recovers first is used.
+
+        Returns:
+            (requests.sessions.Session): Session routed through a TOR circuit
+        """
+        with self._lock:
+            now = monotonic()
+            for _ in range(len(self.sessions)):
+                index = next(self._next) % len(self.sessions)
+                if now >= self.down_until[index]:
+                    return self.sessions[index]
+            index = self.down_until.index(min(self.down_until))
+            return self.sessions[index]
+
+    def get(self, url, max_attempts=None, **kwargs):
+        """Send a GET request through the next healthy circuit, see `requests.get()`
+
+        Rate-limited and failed requests are retried through the next circuit
+        after rotating the one they were sent through.
+
+        Args:
+            url (str): URL to request
+            max_attempts (int, optional): Maximum number of circuits to try, defaults to the
+                number of circuits
+            **kwargs: Keyword arguments of `requests.get()`
+
+        Raises:
+            requests.exceptions.RequestException: Error of the last attempt if all of them failed
+
+        Returns:
+            (requests.models.Response): Response to the request, the last rate-limited one if
+                all attempts were rate limited
+        """
+        if max_attempts is None:
+            max_attempts = len(self.sessions)
+        for attempt in range(max_attempts):
+            session = self.session()
+            try:
+                response = session.get(url, **kwargs)
+            except requests.exceptions.RequestException:
+                self.rotate(session)
+                self._mark_down(self.sessions.index(session))
+                if attempt == max_attempts - 1:
+                    raise
+                continue
+            if response.status_code not in RATE_LIMIT_STATUSES:
+                break
+            self.rotate(session)
+        return response
+
+    def newnym(self):
+        """Signal NEWNYM if there's a control port and TOR accepts it at the moment
+
+        Returns:
+            (bool): Whether the signal has been sent
+        """
+        if self.control_port is None:
+            return False
+        with self._lock:
+            try:
+                if self._controller is None:
+                    self._controller = stem.control.Controller.from_port(
+                        self.host, self.control_port
+                    )
+                    self._controller.authenticate()
+                # TOR ignores NEWNYM signals sent within 10 seconds of each other
+                if not self._controller.is_newnym_available():
+                    return False
+                self._controller.signal(stem.Signal.NEWNYM)
+            except stem.SocketError as error:
+                print("Unable to signal NEWNYM:", error)
+                self._controller = None
+                return False
+        return True
+
+    def rotate(self, session):
+        """Move a session to a new circuit
+
+        Args:
+            session (requests.sessions.Session): Session of the pool
+        """
+        index = self.sessions.index(session)
+        with self._lock:
+            self._new_credentials(index)
+        self.newnym()
+        metrics.count("tor_rotations", port=self.ports[index])
+
+    def check_health(self, url="http://httpbin.org/ip", timeout=30):
+        """Request `url` through every circuit and mark the failing ones as unhealthy
+
+        Failing circuits are rotated and checked once more, circuits that fail
+        both times are skipped for `cooldown` seconds.
+
+        Args:
+            url (str, optional): URL to request, defaults to "http://httpbin.org/ip"
+            timeout (float, optional): Timeout of the requests in seconds, defaults to 30
+
+        Returns:
+            (dict): Mapping of SOCKS ports to response texts (e.g. the exit IP) or None
+        """
+        results = {}
+        for index, session in enumerate(self.sessions):
+            for attempt in range(2):
+                try:
+                    response = session.get(url, timeout=timeout)
+                    ok = response.ok
+                except requests.exceptions.RequestException:
+                    ok = False
+                if ok or attempt == 1:
+                    break
+                with self._lock:
+                    self._new_credentials(index)
+            with self._lock:
+                self.down_until[index] = 0.0 if ok else monotonic() + self.cooldown
+            results[self.ports[index]] = response.text.strip() if ok else None
+        metrics.gauge("tor_healthy_circuits", sum(self.healthy))
+        return results
+
+    def close(self):
+        """Close the sessions and the control connection"""
+        for session in self.sessions:
+            session.close()
+        if self._controller is not None:
+            self._controller.close()
+            self._controller = None
@@ -0,0 +1,130 @@
+"""Trending-term detection over time windows.
+
+Raw word frequencies are dominated by words that are always common, which
+used to be filtered out with a hand-maintained list of words to delete.
+Instead, this module scores a term by how unusual its document frequency is in
+a given window (a day or a week) compared to a rolling baseline of the
+preceding windows:
+
+    z = (share_now - mean(share_baseline)) / (std(share_baseline) + 1 / articles_now)
+
+where `share` is the fraction of articles in a window containing the term. The
+`1 / articles_now` term keeps scores of previously unseen words finite. Only
+per-window document frequencies are stored, so adding a day of articles only
+touches that day's state and invalidates the scores of the windows whose
+baseline includes it.
+
+The module contains the following:
+
+- `TrendingTerms(window="D", baseline=7, min_df=3)` - Incremental burstiness scorer
+"""
+
+from collections import Counter
+import numpy as np
+import pandas as pd
+
+
+class TrendingTerms:
+    """Score terms by burstiness against a rolling baseline
+
+    Args:
+        window (str, optional): Pandas period frequency of a window, e.g. "D" or "W",
+            defaults to "D"
+        baseline (int, optional): Number of preceding windows forming the baseline, defaults to 7
+        min_df (int, optional): Minimum number of articles a term has to appear in within
+            a window to be scored, defaults to 3
+    """
+
+    def __init__(self, window="D", baseline=7, min_df=3):
+        self.window = window
+        self.baseline = baseline
+        self.min_df = min_df
+        # Per-window number of articles containing each term and number of articles
+        self.doc_freq = {}
+        self.doc_count = {}
+        self._scores = {}
+
+    def add(self, df):
+        """Add articles to the per-window document frequencies
+
+        Args:
+            df (pandas.core.frame.DataFrame): Dataframe of articles with `date` and `word_counter`
+        """
+        articles = df[["date", "word_counter"]].dropna()
+        periods = pd.to_datetime(articles.date).dt.to_period(self.window)
+
+        for period, counter in zip(periods, articles.word_counter):
+            self.doc_freq.setdefault(period, Counter()).update(counter.keys())
+            self.doc_count[period] = self.doc_count.get(period, 0) + 1
+
+        # Only windows whose baseline contains a changed window need rescoring
+        for period in set(periods):
+            for offset in range(self.baseline + 1):
+                self._scores.pop(period + offset, None)
+
+    def periods(self):
+        """Sorted list of windows with at least one article"""
+        return sorted(self.doc_count)
+
+    def scores(self, period):
+        """Burstiness scores of all terms in a window
+
+        Args:
+            period (pandas.Period or str): Window to be scored, e.g. "2022-01-15"
+
+        Returns:
+            (pandas.core.series.Series): Scores indexed by term, sorted in descending order
+        """
+        period = pd.Period(period, freq=self.window)
+        if period in self._scores:
+            return self._scores[period]
+
+        current = self.doc_freq.get(period, Counter())
+        terms = [term for term, count in current.items() if count >= self.min_df]
+        baseline = [
+            period - offset
+            for offset in range(1, self.baseline + 1)
+            if period - offset in self.doc_count
+        ]
+        if len(terms) == 0 or len(baseline) == 0:
+            scores = pd.Series(dtype="float64", name="score")
+            self._scores[period] = scores
+            return scores
+
+        n_now = self.doc_count[period]
+        share_now = np.array([current[term] for term in terms]) / n_now
+        share_base = np.array(
+            [[self.doc_freq[b][term] / self.doc_count[b] for b in baseline] for term in terms]
+        )
+        z_scores = (share_now - share_base.mean(axis=1)) / (share_base.std(axis=1) + 1 / n_now)
+
+        scores = pd.Series(z_scores, index=terms, name="score").sort_values(ascending=False)
+        self._scores[period] = scores
+        return scores
+
+    def trending_df(self, top_n=10, start=None, end=None):
+        """Produce a long dataframe of windows / top trending words / scores
+
+        The output can be passed to `hourly_words_barplot()` with
+        `animation_frame="period"` and `y="score"`.
+
+        Args:
+            top_n (int, optional): Number of words per window, defaults to 10
+            start (str or datetime, optional): First window (inclusive)
+            end (str or datetime, optional): Last window (inclusive)
+
+        Returns:
+            (pandas.core.frame.DataFrame): Long dataframe with `period`, `word`, and `score`
+        """
+        periods = self.periods()
+        if start is not None:
+            periods = [p for p in periods if p >= pd.Period(start, freq=self.window)]
+        if end is not None:
+            periods = [p for p in periods if p <= pd.Period(end, freq=self.window)]
+
+        rows = []
+        for period in periods:
+            for word, score in self.scores(period).head(top_n).items():
+                rows.append([str(period), word, score])
+
+        return pd.DataFrame(rows, columns=["period", "word", "score"])
@@ -0,0 +1,154 @@
+"""Approximate heavy-hitter word counting.
+
+Keeping an exact Counter of every word in a continuously growing corpus needs
+an unbounded amount of memory. This module implements the Space-Saving
+algorithm (Metwally et al., 2005), which tracks at most `capacity` words. Any
+word whose true count exceeds `total / capacity` is guaranteed to be tracked,
+and every tracked count overestimates the true count by at most
+`total / capacity`. Sketches built by different workers or over different
+time windows can be merged (Agarwal et al., 2012). The error bound of a
+merged sketch is the sum of the bounds of its parts, i.e. `total / capacity`
+again if both parts have the same capacity.
+
+The module contains the following:
+
+- `SpaceSaving(capacity=1000)` - Mergeable top-k word counter with fixed memory
+"""
+
+import heapq
+from math import ceil
+from collections import Counter
+
+
+class SpaceSaving:
+    """Space-Saving sketch of the most frequent words
+
+    Args:
+        capacity (int, optional): Maximum number of tracked words, defaults to 1000
+    """
+
+    def __init__(self, capacity=1000):
+        if capacity < 1:
+            raise ValueError("The capacity has to be a positive integer.")
+        self.capacity = capacity
+        self.total = 0
+        self.counts = {}
+        self.errors = {}
+        # Error bound and total inherited from merged sketches
+        self._base_error = 0.0
+        self._base_total = 0
+        # Lazy min-heap of (count, word), entries with a stale count are skipped
+        self._heap = []
+
+    @classmethod
+    def from_error(cls, epsilon):
+        """Create a sketch whose counts overestimate by at most `epsilon * total`
+
+        Args:
+            epsilon (float): Relative error bound between 0 and 1
+
+        Returns:
+            (SpaceSaving): Empty sketch
+        """
+        return cls(ceil(1 / epsilon))
+
+    @property
+    def error_bound(self):
+        """Maximum overestimation of any tracked count"""
+        return self._base_error + (self.total - self._base_total) / self.capacity
+
+    def _push(self, word):
+        heapq.heappush(self._heap, (self.counts[word], word))
+        # Rebuild the heap once it holds too many stale entries
+        if len(self._heap) > 4 * self.capacity:
+            self._heap = [(count, word) for word, count in self.counts.items()]
+            heapq.heapify(self._heap)
+
+    def _pop_min(self):
+        while True:
+            count, word = heapq.heappop(self._heap)
+            if self.counts.get(word) == count:
+                return word
+
+    def update(self, word, count=1):
+        """Add `count` occurrences of `word`
+
+        Args:
+            word (str): Word to be counted
+            count (int, optional): Number of occurrences, defaults to 1
+        """
+        self.total += count
+        if word not in self.counts:
+            if len(self.counts) < self.capacity:
+                self.counts[word] = 0
+                self.errors[word] = 0
+            else:
+                # Replace the least frequent word and inherit its count as the error
+                victim = self._pop_min()
+                floor = self.counts.pop(victim)
+                del self.errors[victim]
+                self.counts[word] = floor
+                self.errors[word] = floor
+        self.counts[word] += count
+        self._push(word)
+
+    def update_counter(self, counter):
+        """Add all words of a Counter (e.g. the `word_counter` of an article)
+
+        Args:
+            counter (collections.Counter or dict): Mapping of words to counts
+        """
+        for word, count in counter.items():
+            self.update(word, count)
+
+    def merge(self, other):
+        """Return a new sketch summarizing the words of both `self` and `other`
+
+        Args:
+            other (SpaceSaving): Another sketch
+
+        Returns:
+            (SpaceSaving): Merged sketch with the larger of the two capacities, its
+                `error_bound` is the sum of the bounds of both sketches
+        """
+        # Words missing from a full sketch may have occurred up to its minimum count
+        floor_self = min(self.counts.values()) if len(self.counts) == self.capacity else 0
+        floor_other = (
+            min(other.counts.values()) if len(other.counts) == other.capacity else 0
+        )
+        merged = SpaceSaving(max(self.capacity, other.capacity))
+        merged.total = self.total + other.total
+        # A sketch with a smaller capacity overestimates more, total / capacity would hide it
+        merged._base_error = self.error_bound + other.error_bound
+        merged._base_total = merged.total
+
+        combined = []
+        for word in self.counts.keys() | other.counts.keys():
+            count = self.counts.get(word, floor_self) + other.counts.get(word, floor_other)
+            error = self.errors.get(word, floor_self) + other.errors.get(word, floor_other)
+            combined.append((count, word, error))
+
+        for count, word, error in heapq.nlargest(merged.capacity, combined):
+            merged.counts[word] = count
+            merged.errors[word] = error
+        merged._heap = [(count, word) for word, count in merged.counts.items()]
+        heapq.heapify(merged._heap)
+        return merged
+
+    def __add__(self, other):
+        return self.merge(other)
+
+    def top(self, k=None):
+        """Return the `k` most frequent words and their estimated counts
+
+        Args:
+            k (int, optional): Number of words, defaults to all tracked words
+
+        Returns:
+            (list): List of tuples [("word", count), ...]
+        """
+        return Counter(self.counts).most_common(k)
+
+    def guaranteed(self, word):
+        """Lower bound on the true count of `word`"""
+        return self.counts.get(word, 0) - self.errors.get(word, 0)